@@ -36,7 +36,9 @@ lora_config = LoraConfig(
     lora_dropout=lora_dropout,
     target_modules=["q_proj", "k_proj", "v_proj",  "o_proj", "gate_proj", "down_proj", "up_proj"],
     bias="none",
-    modules_to_save=["lm_head", "embed_tokens"], # Optional to train the embeddings and lm head
+    # vLLM can only serve adapters without modules_to_save, so lm_head and
+    # embed_tokens stay frozen and the adapter is hot-loadable per request.
+    modules_to_save=None,
     task_type="CAUSAL_LM",
     use_rslora=True,
 )
@@ -68,7 +70,12 @@ trainer = Trainer(
 
 trainer.train()
 
-merged_model = model.merge_and_unload()
+# One sub-directory per adapter; OrpheusModel(lora_dir=f"./{base_repo_id}/adapters")
+# picks new ones up without a restart.
+model.save_pretrained(f"./{base_repo_id}/adapters/{run_name}")
 
-merged_model.save_pretrained(f"./{base_repo_id}/merged")
-tokenizer.save_pretrained(f"./{base_repo_id}/merged")
+if config.get("merge_lora", False):
+    merged_model = model.merge_and_unload()
+
+    merged_model.save_pretrained(f"./{base_repo_id}/merged")
+    tokenizer.save_pretrained(f"./{base_repo_id}/merged")
@@ -1,8 +1,34 @@
 """Orpheus Text-to-Speech System."""
+import importlib
 
 __version__ = "0.1.0"
 
 # Import and expose the main function
 # from .main import generate_tokens_sync
-from .decoder import tokens_decoder_sync
-from .engine_class import OrpheusModel
+
+# Public names and the submodule defining each. They are imported on first
+# use, so "import orpheus_tts" loads neither torch, vLLM nor transformers.
+_EXPORTS = {
+    "SNACDecoder": "decoder",
+    "StreamWindow": "decoder",
+    "tokens_decoder_sync": "decoder",
+    "GenerationBudget": "budget",
+    "OrpheusModel": "engine_class",
+    "ModelManager": "manager",
+    "EnginePool": "pool",
+    "Metrics": "metrics",
+    "PriorityPolicy": "scheduling",
+    "TextChunker": "segmenter",
+    "TextFeed": "segmenter",
+    "split_text": "segmenter",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
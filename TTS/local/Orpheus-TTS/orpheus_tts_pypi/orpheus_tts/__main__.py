@@ -0,0 +1,63 @@
+"""Command line entry point: ``python -m orpheus_tts batch prompts.jsonl -o out/``."""
+import argparse
+import json
+
+from .batch import BatchSynthesizer, read_items
+from .decoder import SAMPLE_RATE, SNACDecoder
+from .engine_class import OrpheusModel
+
+
+def batch(args):
+    model = OrpheusModel(
+        model_name=args.model,
+        tokenizer=args.tokenizer,
+        decoder=SNACDecoder(device=args.snac_device),
+        lora_dir=args.lora_dir,
+        max_model_len=args.max_model_len,
+    )
+    try:
+        synthesizer = BatchSynthesizer(
+            model,
+            args.output_dir,
+            audio_format=args.format,
+            sample_rate=args.sample_rate,
+            max_inflight=args.max_inflight,
+            decode_batch_size=args.decode_batch_size,
+            temperature=args.temperature,
+            top_p=args.top_p,
+            repetition_penalty=args.repetition_penalty,
+            stop_token_ids=[128258],
+        )
+        stats = synthesizer.run(read_items(args.input))
+    finally:
+        model.shutdown()
+    print(json.dumps(stats, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="orpheus_tts")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("batch", help="render a JSONL/CSV of (id, text, voice) to audio files")
+    p.add_argument("input", help=".jsonl or .csv with id, text and optional voice columns")
+    p.add_argument("-o", "--output-dir", default="./output/batch")
+    p.add_argument("--model", default="canopylabs/orpheus-tts-0.1-finetune-prod")
+    p.add_argument("--tokenizer", default="canopylabs/orpheus-3b-0.1-pretrained")
+    p.add_argument("--lora-dir", default=None)
+    p.add_argument("--max-model-len", type=int, default=4096)
+    p.add_argument("--snac-device", default=None)
+    p.add_argument("--format", choices=["wav", "pcm"], default="wav")
+    p.add_argument("--sample-rate", type=int, default=SAMPLE_RATE)
+    p.add_argument("--max-inflight", type=int, default=256, help="prompts submitted to vLLM at once")
+    p.add_argument("--decode-batch-size", type=int, default=32, help="utterances per SNAC decode call")
+    p.add_argument("--temperature", type=float, default=0.4)
+    p.add_argument("--top-p", type=float, default=0.9)
+    p.add_argument("--repetition-penalty", type=float, default=1.1)
+    p.set_defaults(func=batch)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Per-request LoRA adapter selection for a shared base model."""
+import itertools
+import os
+import threading
+import time
+
+from vllm.lora.request import LoRARequest
+
+
+class LoRARegistry:
+    """LoRA adapters found under ``directory``, one sub-directory each.
+
+    This is the layout finetune/lora.py writes (``<save_folder>/adapters/<run>``).
+    The directory is rescanned at most every ``rescan_interval`` seconds, so
+    new or retrained adapters are served without restarting the engine; a
+    retrained adapter gets a fresh id so vLLM reloads its weights.
+
+    ``routes`` maps a voice or language to an adapter name. A voice that is
+    itself an adapter name selects that adapter. Async callers should run a
+    due ``refresh()`` in a thread and call ``resolve(..., rescan=False)``, as
+    rescanning lists directories.
+    """
+
+    def __init__(self, directory, routes=None, rescan_interval=5.0):
+        self.directory = directory
+        self.routes = routes or {}
+        self.rescan_interval = rescan_interval
+        self._adapters = {}
+        self._versions = {}
+        self._ids = itertools.count(1)
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version(path):
+        config = os.path.join(path, "adapter_config.json")
+        if not os.path.isfile(config):
+            return None
+        return max(os.path.getmtime(os.path.join(path, name)) for name in os.listdir(path))
+
+    def refresh(self):
+        with self._lock:
+            self._scanned_at = time.monotonic()
+            found = set()
+            for name in sorted(os.listdir(self.directory)):
+                path = os.path.join(self.directory, name)
+                version = self._version(path) if os.path.isdir(path) else None
+                if version is None:
+                    continue
+                found.add(name)
+                if self._versions.get(name) != version:
+                    self._adapters[name] = LoRARequest(name, next(self._ids), path)
+                    self._versions[name] = version
+            for name in set(self._adapters) - found:
+                del self._adapters[name]
+                del self._versions[name]
+
+    @property
+    def names(self):
+        return sorted(self._adapters)
+
+    def rescan_due(self):
+        return time.monotonic() - self._scanned_at > self.rescan_interval
+
+    def resolve(self, voice=None, lang=None, rescan=True):
+        """LoRARequest for this voice / language, or None to use the base model."""
+        if rescan and self.rescan_due():
+            self.refresh()
+        for key in (voice, lang):
+            name = self.routes.get(key, key)
+            if name in self._adapters:
+                return self._adapters[name]
+        return None
@@ -0,0 +1,201 @@
+"""Offline synthesis of many prompts at full engine and SNAC throughput.
+
+Unlike the streaming path, every prompt is submitted to vLLM at once (up to
+``max_inflight``) with ``batch`` priority, each prompt's tokens are collected
+whole, and a decode thread runs SNAC over many utterances per call, padding
+them to a common length. Finished audio goes to a writer thread that writes
+``<id>.wav`` (or ``.pcm``) through a temporary file, so an interrupted run can
+be restarted and skips every prompt whose output already exists. A prompt
+whose generation or write fails is counted as ``failed`` and the run goes on;
+repeated ids are rendered once and counted as ``duplicate``.
+"""
+import asyncio
+import csv
+import json
+import os
+import queue
+import threading
+import time
+import wave
+
+import torch
+
+from .codec import AUDIO_TOKEN_OFFSET, CODEBOOK_SIZE, FRAME_SIZE, deinterleave
+from .decoder import SAMPLE_RATE, SAMPLES_PER_FRAME, to_pcm16
+
+
+def read_items(path):
+    """Yield ``{"id", "text", "voice"}`` dicts from a JSONL or CSV file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            yield {"id": str(row["id"]), "text": row["text"], "voice": row.get("voice") or None}
+
+
+def token_ids_to_frames(token_ids):
+    """Audio token ids -> ``(n, 7)`` codes, dropping frames outside the codebook."""
+    ids = torch.tensor([t for t in token_ids if t >= AUDIO_TOKEN_OFFSET], dtype=torch.int64)
+    num_frames = len(ids) // FRAME_SIZE
+    frames = ids[:num_frames * FRAME_SIZE].reshape(num_frames, FRAME_SIZE)
+    frames = frames - AUDIO_TOKEN_OFFSET - torch.arange(FRAME_SIZE) * CODEBOOK_SIZE
+    return frames[((frames >= 0) & (frames < CODEBOOK_SIZE)).all(dim=1)]
+
+
+class BatchSynthesizer:
+    """Renders items from read_items() with an OrpheusModel; run() returns throughput stats."""
+
+    def __init__(self, model, output_dir, audio_format="wav", sample_rate=SAMPLE_RATE, max_inflight=256,
+                 decode_batch_size=32, decode_max_frames=16384, **sampling_params):
+        self.model = model
+        self.output_dir = output_dir
+        self.audio_format = audio_format
+        self.sample_rate = sample_rate
+        self.max_inflight = max_inflight
+        self.decode_batch_size = decode_batch_size
+        self.decode_max_frames = decode_max_frames
+        self.sampling_params = sampling_params
+        self._decode_queue = queue.Queue()
+        self._write_queue = queue.Queue(maxsize=decode_batch_size * 4)
+        self.stats = {"done": 0, "skipped": 0, "empty": 0, "failed": 0, "duplicate": 0, "tokens": 0, "audio_seconds": 0.0}
+        self._lock = threading.Lock()
+        self._decode_error = None
+
+    def output_path(self, item_id):
+        return os.path.join(self.output_dir, f"{item_id}.{self.audio_format}")
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    # ------------------------------------------------------------ generation
+    async def _generate(self, item, semaphore):
+        async with semaphore:
+            try:
+                token_ids = [t async for t in self.model.generate_tokens_async(
+                    prompt=item["text"], voice=item["voice"], request_id=f"batch-{item['id']}",
+                    priority="batch", **self.sampling_params)]
+            except Exception as e:
+                print(f"Failed to generate {item['id']}: {e}")
+                self._count("failed")
+                return
+        self._count("tokens", len(token_ids))
+        self._decode_queue.put((item, token_ids_to_frames(token_ids)))
+
+    async def _generate_all(self, items):
+        semaphore = asyncio.Semaphore(self.max_inflight)
+        await asyncio.gather(*(self._generate(item, semaphore) for item in items))
+
+    # ------------------------------------------------------------ SNAC decode
+    def _collect(self, first):
+        batch = [first]
+        frames = len(first[1])
+        while len(batch) < self.decode_batch_size and frames < self.decode_max_frames:
+            try:
+                item = self._decode_queue.get(timeout=0.05)
+            except queue.Empty:
+                break
+            if item is None:
+                self._decode_queue.put(None)
+                break
+            batch.append(item)
+            frames += len(item[1])
+        return batch
+
+    def _decode_run(self):
+        try:
+            while True:
+                first = self._decode_queue.get()
+                if first is None:
+                    return
+                batch = self._collect(first)
+                for item, frames in batch:
+                    if not len(frames):
+                        self._count("empty")
+                batch = sorted((entry for entry in batch if len(entry[1])), key=lambda entry: len(entry[1]))
+                if batch:
+                    self._decode_batch(batch)
+        except Exception as e:
+            self._decode_error = e
+        finally:
+            self._write_queue.put(None)
+
+    def _decode_batch(self, batch):
+        # Right-pad with code 0 to the longest utterance; the padded tail is cut off again below.
+        longest = len(batch[-1][1])
+        padded = torch.zeros((len(batch), longest, FRAME_SIZE), dtype=torch.int32)
+        for row, (_, frames) in enumerate(batch):
+            padded[row, :len(frames)] = frames
+        audio = self.model.decoder.decode_codes(deinterleave(padded.reshape(len(batch), -1)))
+        audio = audio[:, 0].detach().cpu().numpy()
+        for samples, (item, frames) in zip(audio, batch):
+            self._write_queue.put((item, to_pcm16(samples[:len(frames) * SAMPLES_PER_FRAME])))
+
+    # ------------------------------------------------------------ writing
+    def _write(self, item_id, pcm):
+        path = self.output_path(item_id)
+        tmp_path = path + ".tmp"
+        if self.audio_format == "wav":
+            with wave.open(tmp_path, "wb") as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(self.sample_rate)
+                f.writeframes(pcm)
+        else:
+            with open(tmp_path, "wb") as f:
+                f.write(pcm)
+        # Only complete files get the final name, so a resumed run redoes partial ones.
+        os.replace(tmp_path, path)
+
+    def _write_run(self):
+        while True:
+            entry = self._write_queue.get()
+            if entry is None:
+                return
+            item, pcm = entry
+            try:
+                self._write(item["id"], pcm)
+            except OSError as e:
+                print(f"Failed to write {item['id']}: {e}")
+                self._count("failed")
+                continue
+            self._count("done")
+            self._count("audio_seconds", len(pcm) / 2 / self.sample_rate)
+
+    def run(self, items):
+        os.makedirs(self.output_dir, exist_ok=True)
+        pending = []
+        seen = set()
+        for item in items:
+            # One output file per id: a repeated id would also collide in vLLM.
+            if item["id"] in seen:
+                print(f"Duplicate id {item['id']}, keeping the first")
+                self.stats["duplicate"] += 1
+                continue
+            seen.add(item["id"])
+            if os.path.exists(self.output_path(item["id"])):
+                self.stats["skipped"] += 1
+            else:
+                pending.append(item)
+
+        started = time.monotonic()
+        decoder = threading.Thread(target=self._decode_run, name="orpheus-batch-decode")
+        writer = threading.Thread(target=self._write_run, name="orpheus-batch-writer")
+        decoder.start()
+        writer.start()
+        try:
+            asyncio.run(self._generate_all(pending))
+        finally:
+            self._decode_queue.put(None)
+            decoder.join()
+            writer.join()
+        elapsed = time.monotonic() - started
+        if self._decode_error is not None:
+            raise self._decode_error
+
+        stats = dict(self.stats, wall_seconds=elapsed)
+        stats["tokens_per_second"] = stats["tokens"] / elapsed if elapsed else 0.0
+        stats["audio_seconds_per_second"] = stats["audio_seconds"] / elapsed if elapsed else 0.0
+        return stats
@@ -0,0 +1,107 @@
+"""Cross-request micro-batching of SNAC decode windows."""
+import collections
+import concurrent.futures
+import queue
+import threading
+import time
+
+import torch
+
+from .codec import CODEBOOK_SIZE, deinterleave
+
+
+class SNACBatchScheduler:
+    """Collects decode windows from concurrent streams and decodes them together.
+
+    A worker thread waits at most ``max_wait_ms`` after the first pending window
+    for up to ``max_batch_size`` windows, groups them by length, runs one
+    ``decode`` call per group and resolves each window's future with its float
+    samples (or None when the window holds out-of-range codes). Windows whose
+    future was cancelled before decoding (the stream went away) are dropped
+    without affecting the rest of their batch.
+    """
+
+    def __init__(self, decode, device, max_batch_size=32, max_wait_ms=5.0):
+        self.decode = decode
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batch_sizes = collections.Counter()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="snac-batch-decoder", daemon=True)
+        self._thread.start()
+
+    def submit(self, multiframe, start=None, end=None):
+        """Queue whole 7-token frames for decoding; returns a concurrent Future."""
+        future = concurrent.futures.Future()
+        num_frames = len(multiframe) // 7
+        self._queue.put((list(multiframe[:num_frames * 7]), start, end, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        batches = sum(self.batch_sizes.values())
+        windows = sum(size * n for size, n in self.batch_sizes.items())
+        return {
+            "batches": batches,
+            "windows": windows,
+            "mean_batch_size": windows / batches if batches else 0.0,
+            "batch_sizes": dict(self.batch_sizes),
+        }
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch first, then stop.
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            # Claim each future; a cancelled one can no longer be resolved.
+            batch = [item for item in self._collect(item) if item[3].set_running_or_notify_cancel()]
+            groups = collections.defaultdict(list)
+            for item in batch:
+                groups[len(item[0])].append(item)
+            for group in groups.values():
+                try:
+                    self._decode_group(group)
+                except Exception as e:
+                    for _, _, _, future in group:
+                        if not future.done():
+                            future.set_exception(e)
+
+    def _decode_group(self, group):
+        frames = torch.tensor([item[0] for item in group], dtype=torch.int32)
+        valid = ((frames >= 0) & (frames < CODEBOOK_SIZE)).all(dim=1)
+        valid_items = [item for item, ok in zip(group, valid.tolist()) if ok]
+        for item, ok in zip(group, valid.tolist()):
+            if not ok and not item[3].done():
+                item[3].set_result(None)
+        if not valid_items:
+            return
+
+        self.batch_sizes[len(valid_items)] += 1
+        codes = deinterleave(frames[valid].to(self.device))
+        audio_hat = self.decode(codes)
+        audio_np = audio_hat[:, 0].detach().cpu().numpy()
+        for samples, (_, start, end, future) in zip(audio_np, valid_items):
+            if not future.done():
+                future.set_result(samples[start:end])
@@ -0,0 +1,86 @@
+"""Per-request token budgets and early stopping of runaway generations."""
+import collections
+import re
+
+import numpy as np
+
+
+# Seven audio tokens per SNAC frame, one frame per 2048 samples at 24 kHz.
+TOKENS_PER_SECOND = 7 * 24000 / 2048
+
+CJK = re.compile(r"[㐀-鿿豈-﫿]")
+
+
+def detect_lang(text):
+    """Rough zh/en guess from the share of CJK characters."""
+    text = "".join(text.split())
+    if not text:
+        return "en"
+    return "zh" if len(CJK.findall(text)) / len(text) > 0.3 else "en"
+
+
+class GenerationBudget:
+    """Sets max_tokens from the prompt and hands out a RunawayDetector per request.
+
+    The budget allows ``margin`` times the expected speaking time for the text
+    (``chars_per_second`` per language), never less than ``min_seconds`` and
+    never more than ``max_tokens``. ``stops`` counts early stops by reason.
+
+    A steady pause can repeat the same frames too, so ``repeat_window``
+    (48 frames, about 4 s) is kept longer than ``silence_seconds``: silent
+    stretches are left to the silence check, and only audible loops end as
+    ``repeated_frames``.
+    """
+
+    def __init__(self, chars_per_second=None, margin=2.0, min_seconds=2.0, max_tokens=4096,
+                 repeat_window=48, max_distinct_frames=2, silence_seconds=3.0, silence_rms=0.005):
+        self.chars_per_second = chars_per_second or {"zh": 4.5, "en": 14.0}
+        self.margin = margin
+        self.min_seconds = min_seconds
+        self.max_tokens = max_tokens
+        self.repeat_window = repeat_window
+        self.max_distinct_frames = max_distinct_frames
+        self.silence_seconds = silence_seconds
+        self.silence_rms = silence_rms
+        self.stops = collections.Counter()
+
+    def max_tokens_for(self, text, lang=None):
+        lang = lang or detect_lang(text)
+        rate = self.chars_per_second.get(lang, self.chars_per_second["en"])
+        seconds = max(len(text.strip()) / rate * self.margin, self.min_seconds)
+        return min(int(seconds * TOKENS_PER_SECOND), self.max_tokens)
+
+    def detector(self):
+        return RunawayDetector(self)
+
+
+class RunawayDetector:
+    """Watches one request's frames and audio for loops and long silences."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.frames = collections.deque(maxlen=budget.repeat_window)
+        self.silent_samples = 0
+        self.reason = None
+
+    def _stop(self, reason):
+        self.reason = reason
+        self.budget.stops[reason] += 1
+        return reason
+
+    def check_frame(self, frame):
+        """Feed one 7-code frame; returns a stop reason when the model is looping."""
+        self.frames.append(tuple(frame))
+        if len(self.frames) == self.frames.maxlen and len(set(self.frames)) <= self.budget.max_distinct_frames:
+            return self._stop("repeated_frames")
+        return None
+
+    def check_audio(self, audio_np):
+        """Feed emitted float samples; returns a stop reason after too much silence."""
+        if len(audio_np) and np.sqrt(np.mean(np.square(audio_np))) < self.budget.silence_rms:
+            self.silent_samples += len(audio_np)
+        else:
+            self.silent_samples = 0
+        if self.silent_samples >= self.budget.silence_seconds * 24000:
+            return self._stop("silence")
+        return None
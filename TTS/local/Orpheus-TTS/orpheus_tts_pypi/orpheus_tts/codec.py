@@ -0,0 +1,79 @@
+"""Packing of SNAC codes into Orpheus' 7-token frame layout.
+
+Each frame holds one code of level 0, two of level 1 and four of level 2,
+interleaved as ``[l0, l1, l2, l2, l1, l2, l2]``. On the token side every slot
+is shifted by ``slot * CODEBOOK_SIZE`` on top of ``AUDIO_TOKEN_OFFSET``.
+"""
+import torch
+
+
+CODEBOOK_SIZE = 4096
+FRAME_SIZE = 7
+# Token id of <custom_token_10>; audio codes start right after the special tokens.
+AUDIO_TOKEN_OFFSET = 128266
+
+LEVEL_1_SLOTS = [1, 4]
+LEVEL_2_SLOTS = [2, 3, 5, 6]
+
+
+def _as_frames(frames):
+    frames = torch.as_tensor(frames)
+    if frames.dim() == 1:
+        frames = frames.unsqueeze(0)
+    num_frames = frames.shape[1] // FRAME_SIZE
+    return frames[:, :num_frames * FRAME_SIZE].reshape(frames.shape[0], num_frames, FRAME_SIZE)
+
+
+def _slot_offsets(frames):
+    return torch.arange(FRAME_SIZE, device=frames.device, dtype=frames.dtype) * CODEBOOK_SIZE
+
+
+def deinterleave(frames):
+    """Split ``(batch, n * 7)`` frame codes into the three SNAC levels.
+
+    A 1-D sequence is treated as a batch of one and trailing partial frames are
+    dropped. Returns ``[(batch, n), (batch, 2n), (batch, 4n)]`` as expected by
+    ``SNAC.decode``.
+    """
+    frames = _as_frames(frames)
+    batch = frames.shape[0]
+    return [
+        frames[:, :, 0],
+        frames[:, :, LEVEL_1_SLOTS].reshape(batch, -1),
+        frames[:, :, LEVEL_2_SLOTS].reshape(batch, -1),
+    ]
+
+
+def interleave(codes):
+    """Inverse of :func:`deinterleave`, returning ``(batch, n * 7)`` frame codes."""
+    codes_0, codes_1, codes_2 = codes
+    batch, num_frames = codes_0.shape
+    frames = torch.empty((batch, num_frames, FRAME_SIZE), dtype=codes_0.dtype, device=codes_0.device)
+    frames[:, :, 0] = codes_0
+    frames[:, :, LEVEL_1_SLOTS] = codes_1.reshape(batch, num_frames, len(LEVEL_1_SLOTS))
+    frames[:, :, LEVEL_2_SLOTS] = codes_2.reshape(batch, num_frames, len(LEVEL_2_SLOTS))
+    return frames.reshape(batch, num_frames * FRAME_SIZE)
+
+
+def codes_in_range(frames):
+    """True if every code fits the SNAC codebook, checked with a single reduction."""
+    frames = torch.as_tensor(frames)
+    return bool(((frames >= 0) & (frames < CODEBOOK_SIZE)).all())
+
+
+def add_slot_offsets(frames):
+    frames = _as_frames(frames)
+    return (frames + _slot_offsets(frames)).reshape(frames.shape[0], -1)
+
+
+def remove_slot_offsets(frames):
+    frames = _as_frames(frames)
+    return (frames - _slot_offsets(frames)).reshape(frames.shape[0], -1)
+
+
+def codes_to_token_ids(frames):
+    return add_slot_offsets(frames) + AUDIO_TOKEN_OFFSET
+
+
+def token_ids_to_codes(token_ids):
+    return remove_slot_offsets(torch.as_tensor(token_ids) - AUDIO_TOKEN_OFFSET)
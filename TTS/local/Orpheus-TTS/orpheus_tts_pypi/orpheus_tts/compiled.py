@@ -0,0 +1,100 @@
+"""Decode callables for a SNAC replica: eager, torch.compile or CUDA graphs.
+
+The streaming decoder always feeds windows of the same shape, so the compiled
+variants are specialised on ``(batch, frames)`` and warmed up ahead of time.
+"""
+import threading
+
+import torch
+
+
+COMPILE_MODES = (None, "torch_compile", "cuda_graph")
+
+
+class EagerDecode:
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, codes):
+        with torch.inference_mode():
+            return self.model.decode(codes)
+
+    def warmup(self, batch, num_frames, device):
+        self(_zero_codes(batch, num_frames, device))
+
+
+class CompiledDecode(EagerDecode):
+    """``torch.compile`` of SNAC.decode with static shapes; runs on CPU and CUDA."""
+
+    def __init__(self, model):
+        super().__init__(model)
+        self._decode = torch.compile(model.decode, dynamic=False)
+
+    def __call__(self, codes):
+        with torch.inference_mode():
+            return self._decode(codes)
+
+
+class CUDAGraphDecode(EagerDecode):
+    """SNAC.decode captured as one CUDA graph per ``(batch, frames)`` shape.
+
+    Smaller batches are zero-padded up to the nearest captured batch size;
+    shapes that were never captured fall back to eager decoding.
+    """
+
+    def __init__(self, model):
+        super().__init__(model)
+        self._graphs = {}
+        self._lock = threading.Lock()
+
+    def warmup(self, batch, num_frames, device):
+        if (batch, num_frames) in self._graphs:
+            return
+        static_codes = _zero_codes(batch, num_frames, device)
+        # Run a few iterations on a side stream before capturing, as torch.cuda.graphs requires.
+        stream = torch.cuda.Stream(device)
+        stream.wait_stream(torch.cuda.current_stream(device))
+        with torch.cuda.stream(stream), torch.inference_mode():
+            for _ in range(3):
+                self.model.decode(static_codes)
+        torch.cuda.current_stream(device).wait_stream(stream)
+
+        graph = torch.cuda.CUDAGraph()
+        # thread_local: CUDA calls other threads make meanwhile (streams still
+        # decoding, an engine serving) neither fail nor invalidate this capture.
+        with torch.inference_mode(), torch.cuda.graph(graph, capture_error_mode="thread_local"):
+            static_audio = self.model.decode(static_codes)
+        self._graphs[(batch, num_frames)] = (graph, static_codes, static_audio)
+
+    def _captured_batch(self, batch, num_frames):
+        sizes = [b for b, n in self._graphs if n == num_frames and b >= batch]
+        return min(sizes) if sizes else None
+
+    def __call__(self, codes):
+        batch, num_frames = codes[0].shape
+        captured = self._captured_batch(batch, num_frames)
+        if captured is None:
+            return super().__call__(codes)
+        graph, static_codes, static_audio = self._graphs[(captured, num_frames)]
+        with self._lock:
+            for static, level in zip(static_codes, codes):
+                static[:batch].copy_(level)
+                static[batch:].zero_()
+            graph.replay()
+            # The next replay overwrites static_audio, so hand out a copy.
+            return static_audio[:batch].clone()
+
+
+def _zero_codes(batch, num_frames, device):
+    return [torch.zeros((batch, num_frames * 2 ** level), dtype=torch.int32, device=device) for level in range(3)]
+
+
+def make_decode(model, device, mode=None):
+    """Pick the decode callable for ``mode``; CUDA graphs fall back to eager off-GPU."""
+    if mode not in COMPILE_MODES:
+        raise ValueError(f"Unknown compile mode {mode!r}, expected one of {COMPILE_MODES}")
+    if mode == "torch_compile":
+        return CompiledDecode(model)
+    if mode == "cuda_graph" and torch.device(device).type == "cuda":
+        return CUDAGraphDecode(model)
+    return EagerDecode(model)
@@ -5,66 +5,198 @@ import asyncio
 import threading
 import queue
 import os
+import itertools
+import time
+from .batching import SNACBatchScheduler
+from .compiled import make_decode
+from .codec import AUDIO_TOKEN_OFFSET, CODEBOOK_SIZE, codes_in_range, deinterleave
+from .metrics import REGISTRY
 
 
-model = SNAC.from_pretrained("hubertsiuzdak/snac_24khz").eval()
+DEFAULT_SNAC_MODEL = os.environ.get("SNAC_MODEL", "hubertsiuzdak/snac_24khz")
 
-snac_device = os.environ.get("SNAC_DEVICE", "cuda" if torch.cuda.is_available() else "cpu")
-model = model.to(snac_device)
+# One level-0 code (one 7-token frame) covers 2048 samples at 24 kHz.
+SAMPLES_PER_FRAME = 2048
+SAMPLE_RATE = 24000
 
 
-def convert_to_audio(multiframe, count):
-  frames = []
-  if len(multiframe) < 7:
-    return
-  
-  codes_0 = torch.tensor([], device=snac_device, dtype=torch.int32)
-  codes_1 = torch.tensor([], device=snac_device, dtype=torch.int32)
-  codes_2 = torch.tensor([], device=snac_device, dtype=torch.int32)
+class StreamWindow:
+    """Frame window used by tokens_decoder while streaming.
 
-  num_frames = len(multiframe) // 7
-  frame = multiframe[:num_frames*7]
+    Every ``hop_frames`` new frames, ``left_context + hop_frames + right_context``
+    frames are decoded and only the audio of the ``hop_frames`` middle frames is
+    emitted. The defaults reproduce the original 28-token window with one frame
+    of output per step. ``crossfade_samples`` blends each chunk's head with the
+    previous window's look-ahead, which keeps larger hops click-free.
+    """
 
-  for j in range(num_frames):
-    i = 7*j
-    if codes_0.shape[0] == 0:
-      codes_0 = torch.tensor([frame[i]], device=snac_device, dtype=torch.int32)
-    else:
-      codes_0 = torch.cat([codes_0, torch.tensor([frame[i]], device=snac_device, dtype=torch.int32)])
+    def __init__(self, left_context=1, hop_frames=1, right_context=2, crossfade_samples=0):
+        if hop_frames < 1 or left_context < 0 or right_context < 0:
+            raise ValueError("hop_frames must be positive and context sizes non-negative")
+        if crossfade_samples > right_context * SAMPLES_PER_FRAME:
+            raise ValueError("crossfade_samples cannot exceed the right context")
+        self.left_context = left_context
+        self.hop_frames = hop_frames
+        self.right_context = right_context
+        self.crossfade_samples = crossfade_samples
 
-    if codes_1.shape[0] == 0:
-      
-      codes_1 = torch.tensor([frame[i+1]], device=snac_device, dtype=torch.int32)
-      codes_1 = torch.cat([codes_1, torch.tensor([frame[i+4]], device=snac_device, dtype=torch.int32)])
-    else:
-      codes_1 = torch.cat([codes_1, torch.tensor([frame[i+1]], device=snac_device, dtype=torch.int32)])
-      codes_1 = torch.cat([codes_1, torch.tensor([frame[i+4]], device=snac_device, dtype=torch.int32)])
-    
-    if codes_2.shape[0] == 0:
-      codes_2 = torch.tensor([frame[i+2]], device=snac_device, dtype=torch.int32)
-      codes_2 = torch.cat([codes_2, torch.tensor([frame[i+3]], device=snac_device, dtype=torch.int32)])
-      codes_2 = torch.cat([codes_2, torch.tensor([frame[i+5]], device=snac_device, dtype=torch.int32)])
-      codes_2 = torch.cat([codes_2, torch.tensor([frame[i+6]], device=snac_device, dtype=torch.int32)])
-    else:
-      codes_2 = torch.cat([codes_2, torch.tensor([frame[i+2]], device=snac_device, dtype=torch.int32)])
-      codes_2 = torch.cat([codes_2, torch.tensor([frame[i+3]], device=snac_device, dtype=torch.int32)])
-      codes_2 = torch.cat([codes_2, torch.tensor([frame[i+5]], device=snac_device, dtype=torch.int32)])
-      codes_2 = torch.cat([codes_2, torch.tensor([frame[i+6]], device=snac_device, dtype=torch.int32)])
-
-  codes = [codes_0.unsqueeze(0), codes_1.unsqueeze(0), codes_2.unsqueeze(0)]
-  # check that all tokens are between 0 and 4096 otherwise return *
-  if torch.any(codes[0] < 0) or torch.any(codes[0] > 4096) or torch.any(codes[1] < 0) or torch.any(codes[1] > 4096) or torch.any(codes[2] < 0) or torch.any(codes[2] > 4096):
-    return
+    @property
+    def window_frames(self):
+        return self.left_context + self.hop_frames + self.right_context
 
-  with torch.inference_mode():
-    audio_hat = model.decode(codes)
-  
-  audio_slice = audio_hat[:, :, 2048:4096]
-  detached_audio = audio_slice.detach().cpu()
-  audio_np = detached_audio.numpy()
+    @property
+    def redundancy(self):
+        """How many times each frame goes through the SNAC decoder."""
+        return self.window_frames / self.hop_frames
+
+
+class SNACDecoder:
+    """Owns the SNAC replicas that turn 7-token frames into audio.
+
+    Nothing is loaded until the first decode (or an explicit ``load()``), so
+    importing the package neither touches the hub nor allocates device memory.
+    ``model_path`` may be a hub id or a local directory such as
+    ``model/snac_24khz``. ``device`` is a device string or a list of them, and
+    ``replicas`` copies are placed on each; decodes are spread round-robin.
+    With ``batching=True`` every replica gets a SNACBatchScheduler that merges
+    windows from concurrent streams into one decode call. ``compile`` selects
+    ``"torch_compile"`` or ``"cuda_graph"`` decoding (see compiled.py); call
+    ``warmup()`` with the streaming window size before serving traffic.
+    Streaming decode times are recorded in ``metrics`` (the default registry).
+    """
+
+    def __init__(self, model_path=DEFAULT_SNAC_MODEL, device=None, replicas=1, batching=False, max_batch_size=32, max_wait_ms=5.0, compile=None, metrics=None):
+        if device is None:
+            device = os.environ.get("SNAC_DEVICE", "cuda" if torch.cuda.is_available() else "cpu")
+        devices = [device] if isinstance(device, str) else list(device)
+        self.model_path = model_path
+        self.devices = [d for d in devices for _ in range(replicas)]
+        self.batching = batching
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.compile = compile
+        self.metrics = metrics or REGISTRY
+        self._models = None
+        self._decoders = None
+        self._schedulers = None
+        self._warmed = set()
+        self._next_replica = itertools.count()
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load every replica now instead of on first use."""
+        if self._models is not None:
+            return
+        with self._lock:
+            if self._models is not None:
+                return
+            models = []
+            for device in self.devices:
+                models.append(SNAC.from_pretrained(self.model_path).eval().to(device))
+            self._decoders = [make_decode(model, device, self.compile) for model, device in zip(models, self.devices)]
+            if self.batching:
+                self._schedulers = [
+                    SNACBatchScheduler(decode, device, self.max_batch_size, self.max_wait_ms)
+                    for decode, device in zip(self._decoders, self.devices)
+                ]
+            self._models = models
+
+    def warmup(self, window_frames=4, batch_sizes=None):
+        """Load the replicas and run (or capture) the fixed streaming window shapes.
+
+        With batching enabled the default covers power-of-two batch sizes up to
+        max_batch_size, which the CUDA-graph path pads smaller batches up to.
+        Shapes that were already warmed up are skipped, so a decoder shared by
+        several models is only warmed once.
+        """
+        self.load()
+        if batch_sizes is None:
+            batch_sizes = [1]
+            while self.batching and batch_sizes[-1] < self.max_batch_size:
+                batch_sizes.append(min(batch_sizes[-1] * 2, self.max_batch_size))
+        with self._lock:
+            for batch in batch_sizes:
+                if (batch, window_frames) in self._warmed:
+                    continue
+                for decode, device in zip(self._decoders, self.devices):
+                    decode.warmup(batch, window_frames, device)
+                self._warmed.add((batch, window_frames))
+
+    def stats(self):
+        if not self._schedulers:
+            return []
+        return [scheduler.stats() for scheduler in self._schedulers]
+
+    def _replica(self):
+        self.load()
+        return next(self._next_replica) % len(self._models)
+
+    def decode_codes(self, codes):
+        index = self._replica()
+        codes = [c.to(self.devices[index]) for c in codes]
+        return self._decoders[index](codes)
+
+    def decode_frames(self, multiframe, start=None, end=None):
+        """Decode whole 7-token frames and return float samples[start:end] on the CPU.
+
+        Returns None when the window is shorter than one frame or holds codes
+        outside the SNAC codebook.
+        """
+        if len(multiframe) < 7:
+            return
+
+        index = self._replica()
+        num_frames = len(multiframe) // 7
+        frame = torch.tensor(multiframe[:num_frames*7], device=self.devices[index], dtype=torch.int32)
+
+        # check that all tokens are within the codebook otherwise return *
+        if not codes_in_range(frame):
+            return
+        codes = deinterleave(frame)
+
+        audio_hat = self._decoders[index](codes)
+
+        audio_slice = audio_hat[0, 0, start:end]
+        return audio_slice.detach().cpu().numpy()
+
+    async def decode_frames_async(self, multiframe, start=None, end=None):
+        started = time.perf_counter()
+        if not self.batching:
+            audio = self.decode_frames(multiframe, start, end)
+        else:
+            scheduler = self._schedulers[self._replica()]
+            audio = await asyncio.wrap_future(scheduler.submit(multiframe, start, end))
+        self.metrics.decode_seconds.observe(time.perf_counter() - started)
+        return audio
+
+    def close(self):
+        for scheduler in self._schedulers or []:
+            scheduler.close()
+
+
+_default_decoder = None
+_default_decoder_lock = threading.Lock()
+
+
+def get_default_decoder():
+    """Process-wide SNACDecoder used when none is passed explicitly."""
+    global _default_decoder
+    with _default_decoder_lock:
+        if _default_decoder is None:
+            _default_decoder = SNACDecoder()
+        return _default_decoder
+
+
+def to_pcm16(audio_np):
   audio_int16 = (audio_np * 32767).astype(np.int16)
-  audio_bytes = audio_int16.tobytes()
-  return audio_bytes
+  return audio_int16.tobytes()
+
+
+def convert_to_audio(multiframe, count):
+  audio_np = get_default_decoder().decode_frames(multiframe, SAMPLES_PER_FRAME, 2 * SAMPLES_PER_FRAME)
+  if audio_np is None:
+    return
+  return to_pcm16(audio_np)
 
 def turn_token_into_id(token_string, index):
     # Strip whitespace
@@ -89,13 +221,34 @@ def turn_token_into_id(token_string, index):
             return None
     else:
         return None
+
+
+def turn_token_id_into_code(token_id, index):
+    return token_id - AUDIO_TOKEN_OFFSET - ((index % 7) * CODEBOOK_SIZE)
   
     
-async def tokens_decoder(token_gen):
+async def tokens_decoder(token_gen, window=None, decoder=None, detector=None):
+    window = window or StreamWindow()
+    decoder = decoder or get_default_decoder()
+    window_tokens = window.window_frames * 7
+    hop_tokens = window.hop_frames * 7
+    start = window.left_context * SAMPLES_PER_FRAME
+    end = start + window.hop_frames * SAMPLES_PER_FRAME
+    crossfade = window.crossfade_samples
+    if crossfade:
+        fade_in = np.linspace(0.0, 1.0, crossfade, dtype=np.float32)
+        fade_out = 1.0 - fade_in
+    tail = None
+
+    # buffer always starts left_context frames before the next frame to emit
     buffer = []
     count = 0
+    stopped = False
     async for token_sim in token_gen:       
-        token = turn_token_into_id(token_sim, count)
+        if isinstance(token_sim, str):
+            token = turn_token_into_id(token_sim, count)
+        else:
+            token = turn_token_id_into_code(token_sim, count)
         if token is None:
             pass
         else:
@@ -103,28 +256,67 @@ async def tokens_decoder(token_gen):
                 buffer.append(token)
                 count += 1
 
-                if count % 7 == 0 and count > 27:
-                    buffer_to_proc = buffer[-28:]
-                    audio_samples = convert_to_audio(buffer_to_proc, count)
-                    if audio_samples is not None:
-                        yield audio_samples
+                if detector is not None and count % 7 == 0 and detector.check_frame(buffer[-7:]):
+                    stopped = True
+                    break
+
+                if len(buffer) == window_tokens:
+                    audio_np = await decoder.decode_frames_async(buffer, start, end + crossfade)
+                    del buffer[:hop_tokens]
+                    if audio_np is None:
+                        tail = None
+                        continue
+                    if crossfade:
+                        if tail is not None:
+                            audio_np[:crossfade] = audio_np[:crossfade] * fade_in + tail * fade_out
+                        tail = audio_np[-crossfade:].copy()
+                        audio_np = audio_np[:-crossfade]
+                    yield to_pcm16(audio_np)
+                    if detector is not None and detector.check_audio(audio_np):
+                        stopped = True
+                        break
+
+    # The stream ended with fewer than a window of frames pending: decode what
+    # is left as one final partial window, so the utterance keeps its tail.
+    if not stopped and len(buffer) // 7 > window.left_context:
+        audio_np = await decoder.decode_frames_async(buffer, start)
+        if audio_np is not None:
+            if crossfade and tail is not None:
+                audio_np[:crossfade] = audio_np[:crossfade] * fade_in + tail * fade_out
+            yield to_pcm16(audio_np)
+
+    # Stopped early or not, make sure the token stream (and its request) ends.
+    if hasattr(token_gen, "aclose"):
+        await token_gen.aclose()
 
 
 # ------------------ Synchronous Tokens Decoder Wrapper ------------------ #
-def tokens_decoder_sync(syn_token_gen):
+def tokens_decoder_sync(syn_token_gen, window=None, decoder=None, detector=None):
 
     audio_queue = queue.Queue()
+    stop = threading.Event()
 
     # Convert the synchronous token generator into an async generator.
     async def async_token_gen():
-        for token in syn_token_gen:
-            yield token
+        try:
+            for token in syn_token_gen:
+                if stop.is_set():
+                    break
+                yield token
+        finally:
+            # Closing the token generator aborts its request if it is still running.
+            if hasattr(syn_token_gen, "close"):
+                syn_token_gen.close()
 
     async def async_producer():
         # tokens_decoder.tokens_decoder is assumed to be an async generator that processes tokens.
-        async for audio_chunk in tokens_decoder(async_token_gen()):
-            audio_queue.put(audio_chunk)
-        audio_queue.put(None)  # Sentinel
+        try:
+            async for audio_chunk in tokens_decoder(async_token_gen(), window, decoder, detector):
+                if stop.is_set():
+                    break
+                audio_queue.put(audio_chunk)
+        finally:
+            audio_queue.put(None)  # Sentinel
 
     def run_async():
         asyncio.run(async_producer())
@@ -132,10 +324,13 @@ def tokens_decoder_sync(syn_token_gen):
     thread = threading.Thread(target=run_async)
     thread.start()
 
-    while True:
-        audio = audio_queue.get()
-        if audio is None:
-            break
-        yield audio
-
-    thread.join()
\ No newline at end of file
+    try:
+        while True:
+            audio = audio_queue.get()
+            if audio is None:
+                break
+            yield audio
+    finally:
+        # Stop the decoder thread as well when the consumer goes away early.
+        stop.set()
+        thread.join()
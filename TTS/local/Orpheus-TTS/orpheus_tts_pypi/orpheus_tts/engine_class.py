@@ -1,23 +1,118 @@
 import asyncio
+import concurrent.futures
+import time
 import torch
 import os
+import uuid
+import functools
 from vllm import AsyncLLMEngine, AsyncEngineArgs, SamplingParams
 from transformers import AutoTokenizer
 import threading
 import queue
-from .decoder import tokens_decoder_sync
+from vllm.inputs import TokensPrompt
+from .adapters import LoRARegistry
+from .budget import GenerationBudget
+from .metrics import REGISTRY, Metrics
+from .scheduling import PriorityPolicy
+from .segmenter import TextChunker, split_text
+from .decoder import SAMPLE_RATE, StreamWindow, get_default_decoder, tokens_decoder, tokens_decoder_sync
+
+# Special tokens wrapping the text prompt: start of human, then end of text,
+# end of human, start of AI and start of speech.
+START_OF_HUMAN = (128259,)
+END_OF_HUMAN = (128009, 128260, 128261, 128257)
+
 
 class OrpheusModel:
-    def __init__(self, model_name, dtype=torch.bfloat16, tokenizer='canopylabs/orpheus-3b-0.1-pretrained', **engine_kwargs):
+    def __init__(self, model_name, dtype=torch.bfloat16, tokenizer='canopylabs/orpheus-3b-0.1-pretrained', stream_window=None, decoder=None, prompt_cache_size=4096, budget=None, lora_dir=None, lora_routes=None, metrics=None, **engine_kwargs):
         self.model_name = self._map_model_params(model_name)
         self.dtype = dtype
+        if lora_dir:
+            # One base model, LoRA adapters picked per request by voice or language.
+            engine_kwargs.setdefault("enable_lora", True)
+            engine_kwargs.setdefault("max_loras", 4)
+            engine_kwargs.setdefault("max_lora_rank", 32)
+        # Let vLLM order waiting requests by the value PriorityPolicy assigns.
+        engine_kwargs.setdefault("scheduling_policy", "priority")
         self.engine_kwargs = engine_kwargs  # vLLM engine kwargs
-        self.engine = self._setup_engine()
+        self.loras = LoRARegistry(lora_dir, lora_routes) if lora_dir else None
+        self.scheduler = PriorityPolicy()
+        self.stream_window = stream_window or StreamWindow()
+        # Sets max_tokens from the text when the caller does not, and stops
+        # requests stuck repeating frames or producing silence.
+        self.budget = budget or GenerationBudget()
+        # Per-request TTFT / TTFA / tokens-per-second / RTF, see metrics.py.
+        self.metrics = metrics or REGISTRY
+        # SNAC decoder shared by all streams; the process-wide default is created lazily.
+        self.decoder = decoder or get_default_decoder()
+        # A single long-lived event loop drives the AsyncLLMEngine so that every
+        # request shares the engine's background loop and continuous batching.
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._run_loop, name="orpheus-engine-loop", daemon=True)
+        self._loop_thread.start()
+        # Requests in flight on the engine loop, and the segment requests of
+        # segmented / streamed replies by their reply's request id.
+        self._active = {}
+        self._segment_parents = {}
+        # unused_max_tokens is the max_tokens headroom aborted requests still
+        # had: an upper bound on the generation avoided, not tokens saved.
+        self.abort_stats = {"aborted_requests": 0, "unused_max_tokens": 0}
         self.available_voices = ["zoe", "zac","jess", "leo", "mia", "julia", "leah"]
-        
+
         # Use provided tokenizer path or default to model_name
         tokenizer_path = tokenizer if tokenizer else model_name
-        self.tokenizer = self._load_tokenizer(tokenizer_path)
+        # Engine, tokenizer and SNAC are independent, so they load side by side;
+        # startup_timings records how long each phase took. A CUDA graph
+        # capture of SNAC waits for the engine instead: an in-process engine
+        # profiles and captures its own graphs on the same device meanwhile.
+        self.startup_timings = {}
+        started = time.monotonic()
+        capture_after_engine = getattr(self.decoder, "compile", None) == "cuda_graph"
+        with concurrent.futures.ThreadPoolExecutor(max_workers=3, thread_name_prefix="orpheus-init") as pool:
+            engine = pool.submit(self._timed, "engine", self._setup_engine)
+            tokenizer = pool.submit(self._timed, "tokenizer", self._load_tokenizer, tokenizer_path)
+            if not capture_after_engine:
+                decoder = pool.submit(self._timed, "decoder", self._prepare_decoder)
+            self.engine = engine.result()
+            if capture_after_engine:
+                decoder = pool.submit(self._timed, "decoder", self._prepare_decoder)
+            self.tokenizer = tokenizer.result()
+            decoder.result()
+        self.startup_timings["total"] = time.monotonic() - started
+        # Per-voice prefixes and whole prompts are tokenized once; repeated
+        # phrases skip the tokenizer entirely.
+        self._voice_prefix_ids = functools.lru_cache(maxsize=256)(self._tokenize_voice_prefix)
+        self._prompt_ids = functools.lru_cache(maxsize=prompt_cache_size)(self._build_prompt_ids)
+
+    def _timed(self, phase, fn, *args):
+        started = time.monotonic()
+        result = fn(*args)
+        self.startup_timings[phase] = time.monotonic() - started
+        return result
+
+    def _prepare_decoder(self):
+        # Load SNAC and run (or compile / capture) the streaming window shape
+        # now, so the first request does not pay for CUDA and kernel warm-up.
+        self.decoder.warmup(self.stream_window.window_frames)
+
+    def warmup(self, prompts, voices=(None,), lang=None, **kwargs):
+        """Synthesize every prompt with every voice and discard the audio.
+
+        Run before taking traffic so the first callers do not pay for kernel
+        selection, LoRA adapter loading or cold caches. The warm-up requests are
+        timed on a throwaway Metrics, so they do not show up in the model's
+        request counts and latency histograms. Returns the seconds taken.
+        """
+        started = time.monotonic()
+        metrics, self.metrics = self.metrics, Metrics()
+        try:
+            for voice in voices:
+                for prompt in prompts:
+                    for _ in self.generate_speech(prompt=prompt, voice=voice, lang=lang, **kwargs):
+                        pass
+        finally:
+            self.metrics = metrics
+        return time.monotonic() - started
 
     def _load_tokenizer(self, tokenizer_path):
         """Load tokenizer from local path or HuggingFace hub"""
@@ -63,12 +158,63 @@ class OrpheusModel:
         )
         
         return AsyncLLMEngine.from_engine_args(engine_args)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def _submit(self, coro):
+        """Schedule a coroutine on the engine loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def sleep(self, level=1):
+        """Free the engine's GPU memory (vLLM sleep mode, needs enable_sleep_mode=True).
+
+        Level 1 offloads the weights to CPU memory and drops the KV cache, so
+        wake_up() is much faster than loading the checkpoint again.
+        """
+        self._submit(self.engine.sleep(level)).result()
+
+    def wake_up(self):
+        self._submit(self.engine.wake_up()).result()
+
+    @property
+    def can_shutdown(self):
+        """False for engines without shutdown(), such as the in-process V0 AsyncLLMEngine."""
+        return hasattr(self.engine, "shutdown")
+
+    def shutdown(self):
+        """Stop the vLLM engine (freeing its GPU memory) and the engine loop thread.
+
+        Returns False when the engine has no shutdown(): its GPU memory then
+        stays allocated until the process exits.
+        """
+        if self.can_shutdown:
+            self.engine.shutdown()
+        else:
+            print(f"WARNING: the engine of {self.model_name} has no shutdown(); its GPU memory is not freed")
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+        return self.can_shutdown
     
     def validate_voice(self, voice):
         if voice:
             if voice not in self.engine.available_voices:
                 raise ValueError(f"Voice {voice} is not available for model {self.model_name}")
     
+    def _tokenize_voice_prefix(self, voice):
+        # "voice:" always ends a pre-token, so it tokenizes the same on its own
+        # as inside "voice: prompt" and can be cached per voice.
+        return tuple(self.tokenizer(f"{voice}:").input_ids)
+
+    def _build_prompt_ids(self, prompt, voice):
+        if voice:
+            text_ids = self._voice_prefix_ids(voice) + tuple(self.tokenizer(f" {prompt}", add_special_tokens=False).input_ids)
+        else:
+            text_ids = tuple(self.tokenizer(prompt).input_ids)
+        return START_OF_HUMAN + text_ids + END_OF_HUMAN
+
     def _format_prompt(self, prompt, voice="tara", model_type="larger"):
         if model_type == "smaller":
             if voice:
@@ -76,59 +222,366 @@ class OrpheusModel:
             else:
                 return f"<custom_token_3>{prompt}<custom_token_4><custom_token_5>"
         else:
-            if voice:
-                adapted_prompt = f"{voice}: {prompt}"
-                prompt_tokens = self.tokenizer(adapted_prompt, return_tensors="pt")
-                start_token = torch.tensor([[ 128259]], dtype=torch.int64)
-                end_tokens = torch.tensor([[128009, 128260, 128261, 128257]], dtype=torch.int64)
-                all_input_ids = torch.cat([start_token, prompt_tokens.input_ids, end_tokens], dim=1)
-                prompt_string = self.tokenizer.decode(all_input_ids[0])
-                return prompt_string
-            else:
-                prompt_tokens = self.tokenizer(prompt, return_tensors="pt")
-                start_token = torch.tensor([[ 128259]], dtype=torch.int64)
-                end_tokens = torch.tensor([[128009, 128260, 128261, 128257]], dtype=torch.int64)
-                all_input_ids = torch.cat([start_token, prompt_tokens.input_ids, end_tokens], dim=1)
-                prompt_string = self.tokenizer.decode(all_input_ids[0])
-                return prompt_string
+            # Hand vLLM the token ids directly instead of a string it would re-tokenize.
+            return TokensPrompt(prompt_token_ids=list(self._prompt_ids(prompt, voice)))
 
- 
+    def _new_request_id(self):
+        return f"req-{uuid.uuid4().hex}"
 
-
-    def generate_tokens_sync(self, prompt, voice=None, request_id="req-001", temperature=0.6, top_p=0.8, max_tokens=1200, stop_token_ids = [49158], repetition_penalty=1.3):
-        prompt_string = self._format_prompt(prompt, voice)
-        print(prompt)
-        sampling_params = SamplingParams(
+    def _sampling_params(self, temperature, top_p, max_tokens, stop_token_ids, repetition_penalty):
+        return SamplingParams(
         temperature=temperature,
         top_p=top_p,
         max_tokens=max_tokens,  # Adjust max_tokens as needed.
         stop_token_ids = stop_token_ids, 
         repetition_penalty=repetition_penalty, 
+        # Audio tokens are consumed as ids, so skip vLLM's detokenizer entirely.
+        detokenize=False,
         )
 
+    async def _new_token_ids(self, results, request_id, max_tokens, on_cancel=None):
+        """Yield only the token ids appended since the previous engine output.
+
+        Runs on the engine loop and registers the request as in flight, so that
+        cancel() can reach the task consuming it. An aborted request ends like a
+        finished one instead of raising CancelledError; ``on_cancel()`` is
+        called when the abort came from cancel().
+        """
+        state = {"task": asyncio.current_task(), "max_tokens": max_tokens, "generated": 0, "aborted": False, "cancelled": False}
+        self._active[request_id] = state
+        seen = 0
+        try:
+            async for result in results:
+                token_ids = result.outputs[0].token_ids
+                for token_id in token_ids[seen:]:
+                    yield token_id
+                seen = len(token_ids)
+                state["generated"] = seen
+        except (asyncio.CancelledError, GeneratorExit) as e:
+            # Abandoned before the engine finished: release its batch slot.
+            self.abort_stats["aborted_requests"] += 1
+            self.abort_stats["unused_max_tokens"] += max(max_tokens - seen, 0)
+            asyncio.ensure_future(self.engine.abort(request_id))
+            if not (state["aborted"] and isinstance(e, asyncio.CancelledError)):
+                raise
+            if state["cancelled"] and on_cancel is not None:
+                on_cancel()
+        finally:
+            self._active.pop(request_id, None)
+
+    def cancel(self, request_id):
+        """Abort generations in flight, e.g. when the caller hangs up or barges in.
+
+        ``request_id`` also matches the per-segment requests of
+        generate_speech_segments / generate_speech_stream started under it,
+        but never other ids it happens to prefix. Returns False when nothing
+        was running under that id.
+        """
+        return self._abort_matching(request_id, cancelled=True)
+
+    def _abort_matching(self, request_id, cancelled=False):
+        # cancelled=False when the consumer itself went away and nobody needs telling.
+        request_ids = [r for r in list(self._active) if r == request_id or self._segment_parents.get(r) == request_id]
+        for r in request_ids:
+            self._loop.call_soon_threadsafe(self._abort, r, cancelled)
+        return bool(request_ids)
+
+    def _abort(self, request_id, cancelled):
+        # _new_token_ids records the abort and calls engine.abort once cancelled.
+        state = self._active.get(request_id)
+        if state is not None:
+            state["aborted"] = True
+            state["cancelled"] = state["cancelled"] or cancelled
+            state["task"].cancel()
+
+    def generate_tokens_sync(self, prompt, voice=None, request_id=None, temperature=0.6, top_p=0.8, max_tokens=None, stop_token_ids = [49158], repetition_penalty=1.3, lang=None, priority="normal", deadline=None, session_id=None, on_cancel=None):
+        if request_id is None:
+            request_id = self._new_request_id()
+        if max_tokens is None:
+            max_tokens = self.budget.max_tokens_for(prompt, lang)
+        prompt_string = self._format_prompt(prompt, voice)
+        lora_request = self.loras.resolve(voice, lang) if self.loras else None
+        print(prompt)
+        sampling_params = self._sampling_params(temperature, top_p, max_tokens, stop_token_ids, repetition_penalty)
+
         token_queue = queue.Queue()
+        priority_value = self.scheduler.acquire(priority, deadline, session_id)
 
         async def async_producer():
-            async for result in self.engine.generate(prompt=prompt_string, sampling_params=sampling_params, request_id=request_id):
-                # Place each token text into the queue.
-                token_queue.put(result.outputs[0].text)
-            token_queue.put(None)  # Sentinel to indicate completion.
+            try:
+                async for token_id in self._new_token_ids(self.engine.generate(prompt=prompt_string, sampling_params=sampling_params, request_id=request_id, lora_request=lora_request, priority=priority_value), request_id, max_tokens, on_cancel):
+                    # Place each new token id into the queue.
+                    token_queue.put(token_id)
+            finally:
+                token_queue.put(None)  # Sentinel to indicate completion.
+                self.scheduler.release(session_id)
 
-        def run_async():
-            asyncio.run(async_producer())
+        future = self._submit(async_producer())
 
-        thread = threading.Thread(target=run_async)
-        thread.start()
+        finished = False
+        try:
+            while True:
+                token = token_queue.get()
+                if token is None:
+                    break
+                yield token
+            finished = True
+        finally:
+            if not finished:
+                # The consumer went away: free the engine's batch slot.
+                self._abort_matching(request_id)
 
+        # Surface engine errors to the caller; a cancelled request just ends.
+        if not future.cancelled():
+            future.result()
+
+    async def _relay(self, agen):
+        """Iterate an async generator on the engine loop from the caller's event loop.
+
+        Items are handed over with call_soon_threadsafe, so no extra thread is
+        involved when the caller already runs an event loop of its own.
+        """
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    loop.call_soon_threadsafe(items.put_nowait, item)
+            finally:
+                try:
+                    loop.call_soon_threadsafe(items.put_nowait, done)
+                except RuntimeError:
+                    # The caller's loop is already gone.
+                    pass
+
+        future = self._submit(pump())
+        try:
+            while True:
+                item = await items.get()
+                if item is done:
+                    break
+                yield item
+            # Surface engine errors to the caller; a cancelled request just ends.
+            if not future.cancelled():
+                await asyncio.wrap_future(future)
+        finally:
+            if not future.done():
+                future.cancel()
+
+    async def generate_tokens_async(self, prompt, voice=None, request_id=None, temperature=0.6, top_p=0.8, max_tokens=None, stop_token_ids = [49158], repetition_penalty=1.3, lang=None, priority="normal", deadline=None, session_id=None, on_cancel=None):
+        if request_id is None:
+            request_id = self._new_request_id()
+        if max_tokens is None:
+            max_tokens = self.budget.max_tokens_for(prompt, lang)
+        prompt_string = self._format_prompt(prompt, voice)
+        lora_request = None
+        if self.loras:
+            # Rescanning the adapter directory is disk I/O; keep it off the caller's loop.
+            if self.loras.rescan_due():
+                await asyncio.to_thread(self.loras.refresh)
+            lora_request = self.loras.resolve(voice, lang, rescan=False)
+        sampling_params = self._sampling_params(temperature, top_p, max_tokens, stop_token_ids, repetition_penalty)
+
+        priority_value = self.scheduler.acquire(priority, deadline, session_id)
+        token_ids = self._new_token_ids(self.engine.generate(prompt=prompt_string, sampling_params=sampling_params, request_id=request_id, lora_request=lora_request, priority=priority_value), request_id, max_tokens, on_cancel)
+        if asyncio.get_running_loop() is not self._loop:
+            token_ids = self._relay(token_ids)
+        finished = False
+        try:
+            async for token_id in token_ids:
+                yield token_id
+            finished = True
+        finally:
+            self.scheduler.release(session_id)
+            if not finished:
+                self._abort_matching(request_id)
+
+    def _timer(self, kwargs):
+        """Start timing a request; pops the on_token / on_chunk / on_stop hooks out of kwargs."""
+        if kwargs.get("request_id") is None:
+            kwargs["request_id"] = self._new_request_id()
+        return self.metrics.request(kwargs["request_id"], SAMPLE_RATE, kwargs.pop("on_token", None), kwargs.pop("on_chunk", None), kwargs.pop("on_stop", None))
+
+    def generate_speech(self, **kwargs):
+        timer = self._timer(kwargs)
+        detector = self.budget.detector()
+        token_ids = self.generate_tokens_sync(on_cancel=functools.partial(timer.stop, "cancelled"), **kwargs)
+        audio = tokens_decoder_sync(timer.wrap_tokens(token_ids), self.stream_window, self.decoder, detector)
+        try:
+            for audio_chunk in audio:
+                timer.chunk(audio_chunk)
+                yield audio_chunk
+        finally:
+            # Abort first so the decoder thread stops waiting for tokens, then join it.
+            self._abort_matching(kwargs["request_id"])
+            audio.close()
+            if detector.reason is not None:
+                timer.stop(detector.reason)
+            timer.finish()
+
+    async def _speech_chunks(self, timer, kwargs):
+        """Audio of one engine request; its tokens and early stops are recorded on ``timer``."""
+        detector = self.budget.detector()
+        token_ids = self.generate_tokens_async(on_cancel=functools.partial(timer.stop, "cancelled"), **kwargs)
+        async for audio_chunk in tokens_decoder(timer.wrap_tokens_async(token_ids), self.stream_window, self.decoder, detector):
+            yield audio_chunk
+        if detector.reason is not None:
+            timer.stop(detector.reason)
+
+    async def generate_speech_async(self, **kwargs):
+        """Async counterpart of generate_speech, yielding PCM chunks without bridge threads."""
+        timer = self._timer(kwargs)
+        try:
+            async for audio_chunk in self._speech_chunks(timer, kwargs):
+                timer.chunk(audio_chunk)
+                yield audio_chunk
+        finally:
+            timer.finish()
+
+    async def _produce_speech(self, segment, index, request_id, chunks, timer, kwargs):
+        # Later segments get more slack, so first sentences of other replies can overtake them.
+        kwargs = dict(kwargs, prompt=segment, request_id=f"{request_id}-{index}",
+                      deadline=self.scheduler.segment_deadline(kwargs.get("priority", "normal"), kwargs.get("deadline"), index))
+        self._segment_parents[kwargs["request_id"]] = request_id
+        try:
+            # Segments share the reply's timer, so TTFA and RTF are what the caller sees.
+            async for audio_chunk in self._speech_chunks(timer, kwargs):
+                chunks.put_nowait(audio_chunk)
+        finally:
+            self._segment_parents.pop(kwargs["request_id"], None)
+            chunks.put_nowait(None)
+
+    async def _drain_in_order(self, task, chunks):
         while True:
-            token = token_queue.get()
-            if token is None:
+            audio_chunk = await chunks.get()
+            if audio_chunk is None:
                 break
-            yield token
+            yield audio_chunk
+        # Surface the segment's error, if any.
+        await task
 
-        thread.join()
-    
-    def generate_speech(self, **kwargs):
-        return tokens_decoder_sync(self.generate_tokens_sync(**kwargs))
+    async def generate_speech_segments_async(self, prompt, max_chars=80, request_id=None, **kwargs):
+        """Synthesize long text sentence by sentence, streaming the audio in order.
 
+        Every segment is submitted to the engine up front so vLLM batches them;
+        audio of segment N is yielded as soon as segment N-1 has finished.
+        """
+        kwargs["request_id"] = request_id
+        timer = self._timer(kwargs)
+        request_id = kwargs.pop("request_id")
+        segments = split_text(prompt, max_chars=max_chars)
+        queues = [asyncio.Queue() for _ in segments]
+        tasks = [
+            asyncio.ensure_future(self._produce_speech(segment, i, request_id, chunks, timer, kwargs))
+            for i, (segment, chunks) in enumerate(zip(segments, queues))
+        ]
+        try:
+            for task, chunks in zip(tasks, queues):
+                async for audio_chunk in self._drain_in_order(task, chunks):
+                    timer.chunk(audio_chunk)
+                    yield audio_chunk
+        finally:
+            for task in tasks:
+                task.cancel()
+            timer.finish()
+
+    async def generate_speech_stream_async(self, text_stream, max_chars=80, request_id=None, **kwargs):
+        """Synthesize text that arrives incrementally, such as streamed LLM output.
+
+        ``text_stream`` is an async iterable of text deltas (a TextFeed, for
+        example); a ``None`` item flushes buffered text. Generation for each
+        unit starts as soon as the TextChunker completes it, and audio is
+        yielded in text order while later text is still arriving.
+        """
+        kwargs["request_id"] = request_id
+        timer = self._timer(kwargs)
+        request_id = kwargs.pop("request_id")
+        chunker = TextChunker(max_chars=max_chars)
+        pending = asyncio.Queue()
+        tasks = []
+
+        def start(units):
+            for unit in units:
+                chunks = asyncio.Queue()
+                task = asyncio.ensure_future(self._produce_speech(unit, len(tasks), request_id, chunks, timer, kwargs))
+                tasks.append(task)
+                pending.put_nowait((task, chunks))
+
+        async def feed():
+            try:
+                async for delta in text_stream:
+                    start(chunker.flush() if delta is None else chunker.feed(delta))
+                start(chunker.flush())
+            finally:
+                pending.put_nowait(None)
+
+        feeder = asyncio.ensure_future(feed())
+        try:
+            while True:
+                entry = await pending.get()
+                if entry is None:
+                    break
+                async for audio_chunk in self._drain_in_order(*entry):
+                    timer.chunk(audio_chunk)
+                    yield audio_chunk
+            await feeder
+        finally:
+            feeder.cancel()
+            for task in tasks:
+                task.cancel()
+            timer.finish()
+
+    def generate_speech_segments(self, **kwargs):
+        return self._iterate_in_thread(self.generate_speech_segments_async(**kwargs))
+
+    def generate_speech_stream(self, **kwargs):
+        return self._iterate_in_thread(self.generate_speech_stream_async(**kwargs))
+
+    def _iterate_in_thread(self, agen):
+        """Drain an async generator on a helper thread's event loop and yield its items."""
+        items = queue.Queue()
+        done = object()
 
+        tasks = []
+
+        async def async_producer():
+            tasks.append(asyncio.current_task())
+            try:
+                async for item in agen:
+                    items.put(item)
+            finally:
+                items.put(done)
+
+        errors = []
+
+        def run_async():
+            try:
+                asyncio.run(async_producer())
+            except BaseException as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run_async)
+        thread.start()
+
+        finished = False
+        try:
+            while True:
+                item = items.get()
+                if item is done:
+                    break
+                yield item
+            finished = True
+        finally:
+            if not finished:
+                # Cancelling the producer cancels every segment and aborts its request.
+                task = tasks[0]
+                try:
+                    task.get_loop().call_soon_threadsafe(task.cancel)
+                except RuntimeError:
+                    # The producer already finished and its loop is closed.
+                    pass
+            thread.join()
+        if errors and finished:
+            raise errors[0]
@@ -0,0 +1,259 @@
+"""On-demand residency of several Orpheus checkpoints on a limited GPU budget."""
+import concurrent.futures
+import gc
+import threading
+import time
+
+import torch
+
+from .engine_class import OrpheusModel
+
+
+def _free_gpu_memory():
+    if not torch.cuda.is_available():
+        return None
+    free, _ = torch.cuda.mem_get_info()
+    return free
+
+
+class Lease:
+    """A model handed out by ModelManager.acquire(); release() is idempotent."""
+
+    def __init__(self, manager, entry):
+        self.manager = manager
+        self.entry = entry
+        self.model = entry.model
+        self._released = False
+
+    def release(self):
+        self.manager._release(self)
+
+
+class _Entry:
+    def __init__(self, name, spec):
+        self.name = name
+        self.spec = spec
+        self.model = None
+        self.state = "unloaded"
+        self.future = None
+        self.in_use = 0
+        self.evictable = True
+        self.last_used = 0.0
+        self.memory_bytes = None
+        self.counters = {
+            "loads": 0,
+            "wakes": 0,
+            "evictions": 0,
+            "sleeps": 0,
+            "load_seconds": 0.0,
+            "wake_seconds": 0.0,
+            "evict_seconds": 0.0,
+            "warmup_seconds": 0.0,
+        }
+
+
+class ModelManager:
+    """Loads OrpheusModel engines on first use and evicts idle ones.
+
+    ``specs`` maps a model name to OrpheusModel keyword arguments; nothing is
+    loaded until ``acquire()`` or ``prefetch()``. At most ``max_resident``
+    engines hold GPU memory, and with ``memory_budget_bytes`` their measured
+    footprint (drop in free device memory while loading) must also fit.
+    Making room evicts the least recently used engine that no lease holds.
+    With ``sleep=True`` evicted engines go to vLLM sleep mode instead of
+    being shut down, so bringing them back is a wake-up rather than a reload.
+    An engine that cannot be shut down (the in-process V0 AsyncLLMEngine) is
+    put to sleep instead; if that fails too it stays resident and is never
+    picked for eviction again, rather than being reported unloaded while its
+    memory is still held.
+
+    Loads run one at a time on a background thread. Callers asking for a
+    model that is still loading wait for the same load. ``on_load(name,
+    model)`` runs on that thread after every fresh load, before the model is
+    handed out, which is where warm-up belongs. The last load, wake, warm-up
+    and evict latencies and their counts are reported by ``stats()``.
+    """
+
+    def __init__(self, specs, max_resident=2, memory_budget_bytes=None, sleep=False, on_load=None):
+        self.max_resident = max_resident
+        self.memory_budget_bytes = memory_budget_bytes
+        self.sleep = sleep
+        self.on_load = on_load
+        self._entries = {name: _Entry(name, dict(spec)) for name, spec in specs.items()}
+        self._lock = threading.Lock()
+        self._loader = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="orpheus-model-loader")
+
+    @property
+    def names(self):
+        return list(self._entries)
+
+    def model_name(self, name):
+        """Checkpoint path of ``name``, known without loading it."""
+        return self._entries[name].spec["model_name"]
+
+    def resident(self):
+        with self._lock:
+            return [entry.model for entry in self._entries.values() if entry.state == "resident"]
+
+    def prefetch(self, name):
+        """Start loading ``name`` in the background; returns a Future."""
+        with self._lock:
+            entry = self._entries[name]
+            if entry.state == "resident":
+                done = concurrent.futures.Future()
+                done.set_result(entry.model)
+                return done
+            if entry.future is None:
+                entry.state = "loading"
+                entry.future = self._loader.submit(self._load, entry)
+            return entry.future
+
+    def try_acquire(self, name):
+        """Return a Lease if ``name`` is resident right now, else None without loading."""
+        with self._lock:
+            entry = self._entries[name]
+            if entry.state != "resident":
+                return None
+            entry.in_use += 1
+            entry.last_used = time.monotonic()
+            return Lease(self, entry)
+
+    def acquire(self, name, timeout=None):
+        """Block until ``name`` is resident and return a Lease on it."""
+        while True:
+            self.prefetch(name).result(timeout)
+            # It may have been evicted again between the load and taking the lease.
+            lease = self.try_acquire(name)
+            if lease is not None:
+                return lease
+
+    def _release(self, lease):
+        with self._lock:
+            if lease._released:
+                return
+            lease._released = True
+            lease.entry.in_use -= 1
+            lease.entry.last_used = time.monotonic()
+
+    def _load(self, entry):
+        try:
+            self._make_room(entry)
+            free_before = _free_gpu_memory()
+            started = time.monotonic()
+            if entry.model is not None:
+                entry.model.wake_up()
+                entry.counters["wakes"] += 1
+                entry.counters["wake_seconds"] = time.monotonic() - started
+            else:
+                kwargs = dict(entry.spec)
+                if self.sleep:
+                    kwargs.setdefault("enable_sleep_mode", True)
+                entry.model = OrpheusModel(**kwargs)
+                entry.counters["loads"] += 1
+                entry.counters["load_seconds"] = time.monotonic() - started
+                free_after = _free_gpu_memory()
+                if free_before is not None:
+                    entry.memory_bytes = max(free_before - free_after, 0)
+                if self.on_load is not None:
+                    started = time.monotonic()
+                    try:
+                        self.on_load(entry.name, entry.model)
+                    except Exception as e:
+                        # Warm-up is best effort; a cold but working model is still served.
+                        print(f"on_load for {entry.name} failed: {e}")
+                    entry.counters["warmup_seconds"] = time.monotonic() - started
+            with self._lock:
+                entry.state = "resident"
+                entry.last_used = time.monotonic()
+                entry.future = None
+            return entry.model
+        except BaseException:
+            with self._lock:
+                entry.state = "sleeping" if entry.model is not None else "unloaded"
+                entry.future = None
+            raise
+
+    def _needs_room(self, entry):
+        resident = [e for e in self._entries.values() if e.state == "resident"]
+        if len(resident) >= self.max_resident:
+            return True
+        if self.memory_budget_bytes is None:
+            return False
+        known = [e.memory_bytes for e in self._entries.values() if e.memory_bytes]
+        expected = entry.memory_bytes or (max(known) if known else 0)
+        used = sum(e.memory_bytes or expected for e in resident)
+        return used + expected > self.memory_budget_bytes
+
+    def _make_room(self, entry):
+        while True:
+            with self._lock:
+                if not self._needs_room(entry):
+                    return
+                idle = [e for e in self._entries.values() if e.state == "resident" and e.in_use == 0 and e.evictable]
+                if not idle:
+                    # Everything resident is serving; load anyway rather than fail the request.
+                    return
+                victim = min(idle, key=lambda e: e.last_used)
+                victim.state = "evicting"
+            self._evict(victim)
+
+    def _evict(self, entry):
+        """Free ``entry``'s GPU memory; returns False, leaving it resident, when it cannot."""
+        started = time.monotonic()
+        if self.sleep or not entry.model.can_shutdown:
+            if not self.sleep:
+                print(f"WARNING: {entry.name} cannot be shut down, putting it to sleep instead")
+            try:
+                entry.model.sleep()
+            except Exception as e:
+                print(f"WARNING: cannot evict {entry.name}, sleep failed: {e}; keeping it resident")
+                with self._lock:
+                    entry.evictable = False
+                    if entry.state == "evicting":
+                        entry.state = "resident"
+                return False
+            entry.counters["sleeps"] += 1
+            state = "sleeping"
+        else:
+            entry.model.shutdown()
+            entry.model = None
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            state = "unloaded"
+        entry.counters["evictions"] += 1
+        entry.counters["evict_seconds"] = time.monotonic() - started
+        with self._lock:
+            # A prefetch may already have queued the reload.
+            if entry.state == "evicting":
+                entry.state = state
+        return True
+
+    def evict(self, name):
+        """Evict ``name`` if it is resident and idle; returns True if it was.
+
+        Runs on the loader thread so it never overlaps a load or wake-up.
+        """
+        return self._loader.submit(self._evict_if_idle, self._entries[name]).result()
+
+    def _evict_if_idle(self, entry):
+        with self._lock:
+            if entry.state != "resident" or entry.in_use:
+                return False
+            entry.state = "evicting"
+        return self._evict(entry)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: dict(
+                    entry.counters,
+                    resident=entry.state == "resident",
+                    evictable=entry.evictable,
+                    in_use=entry.in_use,
+                    memory_bytes=entry.memory_bytes or 0,
+                    idle_seconds=now - entry.last_used if entry.last_used else 0.0,
+                )
+                for name, entry in self._entries.items()
+            }
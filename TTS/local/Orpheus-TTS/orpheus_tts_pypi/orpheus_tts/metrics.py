@@ -0,0 +1,214 @@
+"""Request timings in the Prometheus text format, without extra dependencies."""
+import bisect
+import re
+import threading
+import time
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TOKEN_RATE_BUCKETS = (10, 25, 50, 75, 100, 150, 200, 300, 500)
+RTF_BUCKETS = (0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 4.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", str(name))
+
+
+def samples(name, value, labels=None):
+    """Flatten a stats value into (name, labels, number): dict keys extend the
+    name, list items get an ``index`` label, non-numeric leaves are skipped."""
+    labels = labels or {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from samples(f"{name}_{_metric_name(key)}", item, labels)
+    elif isinstance(value, (list, tuple)):
+        for index, item in enumerate(value):
+            yield from samples(name, item, dict(labels, index=index))
+    elif isinstance(value, (bool, int, float)):
+        yield name, labels, float(value)
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def render(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self.value}",
+        ]
+
+
+class Gauge(Counter):
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+    def render(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self.value}",
+        ]
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum {self.sum}")
+            lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+class RequestTimer:
+    """Timings of one speech request; created by Metrics.request().
+
+    Feed it every token id and PCM chunk, then call finish() exactly once
+    (extra calls are ignored). The optional ``on_token(request_id, token_id)``
+    and ``on_chunk(request_id, chunk)`` callbacks run on the thread that
+    produced the item. ``on_stop(request_id, reason)`` runs whenever part of
+    the request ended early (``"cancelled"`` or a GenerationBudget stop reason),
+    i.e. its audio is incomplete.
+    """
+
+    def __init__(self, metrics, request_id, sample_rate, on_token=None, on_chunk=None, on_stop=None):
+        self.metrics = metrics
+        self.request_id = request_id
+        self.sample_rate = sample_rate
+        self.on_token = on_token
+        self.on_chunk = on_chunk
+        self.on_stop = on_stop
+        self.stop_reason = None
+        self.start = time.monotonic()
+        self.first_token = None
+        self.last_token = None
+        self.first_chunk = None
+        self.tokens = 0
+        self.samples = 0
+        self._finished = False
+        metrics.requests.inc()
+        metrics.active_streams.inc()
+
+    def token(self, token_id):
+        now = time.monotonic()
+        if self.first_token is None:
+            self.first_token = now
+            self.metrics.ttft.observe(now - self.start)
+        self.last_token = now
+        self.tokens += 1
+        if self.on_token is not None:
+            self.on_token(self.request_id, token_id)
+
+    def chunk(self, chunk):
+        if self.first_chunk is None:
+            self.first_chunk = time.monotonic()
+            self.metrics.ttfa.observe(self.first_chunk - self.start)
+        self.samples += len(chunk) // 2  # 16-bit mono PCM
+        if self.on_chunk is not None:
+            self.on_chunk(self.request_id, chunk)
+
+    def stop(self, reason):
+        if self.stop_reason is None:
+            self.stop_reason = reason
+        if self.on_stop is not None:
+            self.on_stop(self.request_id, reason)
+
+    def wrap_tokens(self, token_gen):
+        try:
+            for token_id in token_gen:
+                self.token(token_id)
+                yield token_id
+        finally:
+            token_gen.close()
+
+    async def wrap_tokens_async(self, token_gen):
+        try:
+            async for token_id in token_gen:
+                self.token(token_id)
+                yield token_id
+        finally:
+            await token_gen.aclose()
+
+    def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        metrics = self.metrics
+        metrics.active_streams.dec()
+        metrics.tokens.inc(self.tokens)
+        audio_seconds = self.samples / self.sample_rate
+        metrics.audio_seconds.inc(audio_seconds)
+        if self.tokens > 1 and self.last_token > self.first_token:
+            metrics.tokens_per_second.observe((self.tokens - 1) / (self.last_token - self.first_token))
+        if audio_seconds:
+            metrics.rtf.observe((time.monotonic() - self.start) / audio_seconds)
+
+
+class Metrics:
+    """Registry of the stack's timings; ``REGISTRY`` is the process-wide default."""
+
+    def __init__(self, prefix="orpheus"):
+        self.ttft = Histogram(f"{prefix}_time_to_first_token_seconds", "Time from submission to the first generated token.")
+        self.ttfa = Histogram(f"{prefix}_time_to_first_audio_seconds", "Time from submission to the first PCM chunk.")
+        self.tokens_per_second = Histogram(f"{prefix}_tokens_per_second", "Per-request decode rate after the first token.", TOKEN_RATE_BUCKETS)
+        self.rtf = Histogram(f"{prefix}_real_time_factor", "Wall time divided by audio duration per request.", RTF_BUCKETS)
+        self.decode_seconds = Histogram(f"{prefix}_snac_decode_seconds", "SNAC decode time per chunk, including batching wait.")
+        self.queue_wait = Histogram(f"{prefix}_queue_wait_seconds", "Time spent waiting for admission.")
+        self.active_streams = Gauge(f"{prefix}_active_streams", "Speech requests currently streaming.")
+        self.requests = Counter(f"{prefix}_requests_total", "Speech requests started.")
+        self.tokens = Counter(f"{prefix}_generated_tokens_total", "Tokens generated by finished requests.")
+        self.audio_seconds = Counter(f"{prefix}_audio_seconds_total", "Audio produced by finished requests.")
+
+    def request(self, request_id, sample_rate, on_token=None, on_chunk=None, on_stop=None):
+        return RequestTimer(self, request_id, sample_rate, on_token, on_chunk, on_stop)
+
+    def render(self, extra=()):
+        """Text exposition of every metric, plus ``(name, labels, stats)``
+        entries from ``extra`` flattened into untyped samples."""
+        lines = []
+        for metric in (self.ttft, self.ttfa, self.tokens_per_second, self.rtf, self.decode_seconds,
+                       self.queue_wait, self.active_streams, self.requests, self.tokens, self.audio_seconds):
+            lines.extend(metric.render())
+        for name, labels, stats in extra:
+            for sample, sample_labels, value in samples(name, stats, labels):
+                lines.append(f"{sample}{_format_labels(sample_labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Metrics()
@@ -0,0 +1,146 @@
+"""Several OrpheusModel replicas behind the single-model generate_speech API."""
+import collections
+import contextlib
+import os
+import threading
+
+from .decoder import SNACDecoder, StreamWindow
+from .engine_class import OrpheusModel
+
+
+@contextlib.contextmanager
+def _environ(**variables):
+    previous = {name: os.environ.get(name) for name in variables}
+    os.environ.update(variables)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                del os.environ[name]
+            else:
+                os.environ[name] = value
+
+
+class EnginePool:
+    """Routes speech requests over OrpheusModel replicas.
+
+    Each request is charged its estimated token count (the replica's
+    GenerationBudget for the text, ``stream_tokens`` for open-ended streams)
+    until it ends, and goes to the replica with the fewest outstanding tokens.
+    A (voice, lang) pair sticks to the replica it last ran on while that
+    replica is within ``affinity_slack`` tokens of the least loaded one, so
+    prefix-cache hits and loaded LoRA adapters are reused. Segmented and
+    streamed replies run entirely on one replica to keep their order.
+    """
+
+    def __init__(self, replicas, affinity_slack=1024, stream_tokens=1024):
+        if not replicas:
+            raise ValueError("EnginePool needs at least one replica")
+        self.replicas = list(replicas)
+        self.affinity_slack = affinity_slack
+        self.stream_tokens = stream_tokens
+        self._outstanding = [0] * len(self.replicas)
+        self._affinity = {}
+        self._lock = threading.Lock()
+        self.routed = collections.Counter()
+
+    @classmethod
+    def from_devices(cls, model_name, gpus, snac_devices=None, affinity_slack=1024, **model_kwargs):
+        """One replica per entry of ``gpus`` (CUDA indices such as ``"0"`` or ``"2,3"``).
+
+        SNAC runs in this process, so each replica's decoder is placed by an
+        explicit device, ``snac_devices[i]`` (by default the first GPU of the
+        entry), and loaded and warmed up before any engine starts, with every
+        GPU visible. The vLLM engine core is started in a spawned V1 process
+        whose CUDA_VISIBLE_DEVICES is the entry; once this process has
+        initialised CUDA, that is the only place the variable still applies.
+        A vLLM build that cannot run the engine that way fails to start rather
+        than placing every replica on the first GPU.
+        """
+        snac_devices = snac_devices or [f"cuda:{str(gpu).split(',')[0]}" for gpu in gpus]
+        window = model_kwargs.get("stream_window") or StreamWindow()
+        decoders = []
+        for snac_device in snac_devices:
+            decoder = SNACDecoder(device=snac_device, batching=True)
+            decoder.warmup(window.window_frames)
+            decoders.append(decoder)
+        replicas = []
+        for gpu, decoder in zip(gpus, decoders):
+            with _environ(CUDA_VISIBLE_DEVICES=str(gpu), VLLM_USE_V1="1",
+                          VLLM_ENABLE_V1_MULTIPROCESSING="1", VLLM_WORKER_MULTIPROC_METHOD="spawn"):
+                replicas.append(OrpheusModel(model_name, decoder=decoder, **model_kwargs))
+        return cls(replicas, affinity_slack=affinity_slack)
+
+    def _route(self, voice, lang, cost):
+        key = (voice, lang)
+        with self._lock:
+            least = min(range(len(self.replicas)), key=self._outstanding.__getitem__)
+            index = self._affinity.get(key, least)
+            if self._outstanding[index] > self._outstanding[least] + self.affinity_slack:
+                index = least
+            self._affinity[key] = index
+            self._outstanding[index] += cost
+            self.routed[index] += 1
+        return index
+
+    def _release(self, index, cost):
+        with self._lock:
+            self._outstanding[index] -= cost
+
+    def _cost(self, kwargs):
+        if "prompt" not in kwargs:
+            return self.stream_tokens
+        if kwargs.get("max_tokens"):
+            return kwargs["max_tokens"]
+        return self.replicas[0].budget.max_tokens_for(kwargs["prompt"], kwargs.get("lang"))
+
+    def _run(self, method, kwargs):
+        cost = self._cost(kwargs)
+        index = self._route(kwargs.get("voice"), kwargs.get("lang"), cost)
+        try:
+            yield from getattr(self.replicas[index], method)(**kwargs)
+        finally:
+            self._release(index, cost)
+
+    async def _run_async(self, method, kwargs):
+        cost = self._cost(kwargs)
+        index = self._route(kwargs.get("voice"), kwargs.get("lang"), cost)
+        try:
+            async for audio_chunk in getattr(self.replicas[index], method)(**kwargs):
+                yield audio_chunk
+        finally:
+            self._release(index, cost)
+
+    def generate_speech(self, **kwargs):
+        return self._run("generate_speech", kwargs)
+
+    def generate_speech_segments(self, **kwargs):
+        return self._run("generate_speech_segments", kwargs)
+
+    def generate_speech_stream(self, **kwargs):
+        return self._run("generate_speech_stream", kwargs)
+
+    def generate_speech_async(self, **kwargs):
+        return self._run_async("generate_speech_async", kwargs)
+
+    def generate_speech_segments_async(self, **kwargs):
+        return self._run_async("generate_speech_segments_async", kwargs)
+
+    def generate_speech_stream_async(self, **kwargs):
+        return self._run_async("generate_speech_stream_async", kwargs)
+
+    def cancel(self, request_id):
+        cancelled = [replica.cancel(request_id) for replica in self.replicas]
+        return any(cancelled)
+
+    def shutdown(self):
+        for replica in self.replicas:
+            replica.shutdown()
+
+    def stats(self):
+        with self._lock:
+            return [
+                {"outstanding_tokens": outstanding, "routed": self.routed[index]}
+                for index, outstanding in enumerate(self._outstanding)
+            ]
@@ -0,0 +1,60 @@
+"""Priority / deadline values for vLLM's priority scheduler."""
+import collections
+import threading
+import time
+
+
+# Default latency target in seconds for each priority class.
+PRIORITY_CLASSES = {
+    "interactive": 1.0,
+    "normal": 3.0,
+    "batch": 600.0,
+}
+
+
+class PriorityPolicy:
+    """Turns (priority class, deadline, session) into a vLLM ``priority`` value.
+
+    vLLM schedules lower values first. Classes are strictly ordered; within a
+    class requests run earliest-deadline-first, and every request a session
+    already has in flight pushes its next one back by ``session_penalty``
+    seconds so one busy caller cannot starve the others. Segments of one reply
+    get ``segment_spacing`` seconds of extra slack each, so the first sentence
+    of a new reply overtakes the tail sentences of older ones.
+    """
+
+    CLASS_GAP_MS = 10 ** 12
+
+    def __init__(self, session_penalty=0.5, segment_spacing=1.0):
+        self.session_penalty = session_penalty
+        self.segment_spacing = segment_spacing
+        self._epoch = time.monotonic()
+        self._sessions = collections.Counter()
+        self._lock = threading.Lock()
+
+    def segment_deadline(self, priority="normal", deadline=None, index=0):
+        if deadline is None:
+            deadline = PRIORITY_CLASSES[priority]
+        return deadline + index * self.segment_spacing
+
+    def acquire(self, priority="normal", deadline=None, session_id=None):
+        """Priority value for a new request; pair with release(session_id)."""
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {list(PRIORITY_CLASSES)}")
+        if deadline is None:
+            deadline = PRIORITY_CLASSES[priority]
+        with self._lock:
+            if session_id is not None:
+                deadline += self._sessions[session_id] * self.session_penalty
+                self._sessions[session_id] += 1
+        due_ms = int((time.monotonic() - self._epoch + deadline) * 1000)
+        rank = list(PRIORITY_CLASSES).index(priority)
+        return rank * self.CLASS_GAP_MS + due_ms
+
+    def release(self, session_id):
+        if session_id is None:
+            return
+        with self._lock:
+            self._sessions[session_id] -= 1
+            if self._sessions[session_id] <= 0:
+                del self._sessions[session_id]
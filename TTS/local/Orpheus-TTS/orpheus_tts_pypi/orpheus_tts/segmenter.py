@@ -0,0 +1,170 @@
+"""Split long Chinese / English text into synthesizable segments."""
+import asyncio
+import re
+import threading
+
+
+# Sentence ends, with any closing quotes or brackets that follow them. An ASCII
+# period only counts when followed by whitespace so "3.5" or "v1.0" stay whole.
+SENTENCE_END = re.compile(r"(?:[。！？!?；;…]+|\.(?=\s|$))[”’」』）)\"']*|\n+")
+# Clause ends; an ASCII comma or colon between digits ("12,000", "10:30") is not one.
+CLAUSE_END = re.compile(r"[，、：]|(?<!\d)[,:]|[,:](?!\d)")
+
+
+def _cut(text, pattern):
+    pieces = []
+    start = 0
+    for match in pattern.finditer(text):
+        pieces.append(text[start:match.end()])
+        start = match.end()
+    pieces.append(text[start:])
+    return [piece for piece in pieces if piece.strip()]
+
+
+def _split_long(sentence, max_chars):
+    """Pack clauses of an over-long sentence into pieces of at most max_chars."""
+    pieces = []
+    current = ""
+    for clause in _cut(sentence, CLAUSE_END):
+        while len(clause) > max_chars:
+            pieces.append(current + clause[:max_chars - len(current)])
+            clause = clause[max_chars - len(current):]
+            current = ""
+        if current and len(current) + len(clause) > max_chars:
+            pieces.append(current)
+            current = ""
+        current += clause
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text(text, max_chars=80, min_chars=8):
+    """Split text at sentence boundaries, then at clause boundaries when too long.
+
+    Segments shorter than ``min_chars`` are merged into the following one,
+    since very short prompts tend to produce clipped or unstable audio.
+    """
+    segments = []
+    for sentence in _cut(text, SENTENCE_END):
+        if len(sentence) <= max_chars:
+            segments.append(sentence)
+        else:
+            segments.extend(_split_long(sentence, max_chars))
+
+    merged = []
+    carry = ""
+    for segment in segments:
+        segment = carry + segment
+        if len(segment.strip()) < min_chars:
+            carry = segment
+            continue
+        merged.append(segment.strip())
+        carry = ""
+    if carry.strip():
+        if merged:
+            merged[-1] = f"{merged[-1]}{carry}".strip()
+        else:
+            merged.append(carry.strip())
+    return merged
+
+
+class TextChunker:
+    """Accumulates streamed text (e.g. LLM deltas) and hands out synthesizable units.
+
+    A sentence or clause end is only trusted once another character has
+    arrived, so a closing quote or the rest of a number is not cut off. The first
+    unit may be a single clause of ``first_clause_chars`` or more, to start
+    audio early; text without any boundary is cut once it exceeds ``max_chars``.
+    """
+
+    def __init__(self, max_chars=80, min_chars=8, first_clause_chars=12):
+        self.max_chars = max_chars
+        self.min_chars = min_chars
+        self.first_clause_chars = first_clause_chars
+        self.buffer = ""
+        self.units_emitted = 0
+
+    def _cut_point(self):
+        end = 0
+        for match in SENTENCE_END.finditer(self.buffer):
+            if match.end() < len(self.buffer):
+                end = match.end()
+        clause_ends = [match.end() for match in CLAUSE_END.finditer(self.buffer) if match.end() < len(self.buffer)]
+        if not end and not self.units_emitted:
+            end = next((clause_end for clause_end in clause_ends if clause_end >= self.first_clause_chars), 0)
+        if not end and len(self.buffer) > self.max_chars:
+            end = max((clause_end for clause_end in clause_ends if clause_end <= self.max_chars), default=self.max_chars)
+        return end
+
+    def _units(self, text):
+        units = split_text(text, max_chars=self.max_chars, min_chars=self.min_chars)
+        self.units_emitted += len(units)
+        return units
+
+    def feed(self, delta):
+        """Add a text delta and return the units that became complete."""
+        self.buffer += delta
+        end = self._cut_point()
+        if not end or len(self.buffer[:end].strip()) < self.min_chars:
+            return []
+        text, self.buffer = self.buffer[:end], self.buffer[end:]
+        return self._units(text)
+
+    def flush(self):
+        """Return whatever is buffered as units, complete or not."""
+        text, self.buffer = self.buffer, ""
+        if not text.strip():
+            return []
+        return self._units(text)
+
+
+FLUSH = None
+_CLOSED = object()
+
+
+class TextFeed:
+    """Thread-safe source of text deltas for OrpheusModel.generate_speech_stream.
+
+    Producers call put()/flush()/close() from any thread; the generation side
+    iterates it asynchronously. ``flush()`` shows up as ``FLUSH`` (None) and
+    asks the chunker to synthesize whatever it holds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._backlog = []
+        self._loop = None
+        self._queue = None
+
+    def _put(self, item):
+        with self._lock:
+            if self._loop is None:
+                self._backlog.append(item)
+                return
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+    def put(self, text):
+        self._put(text)
+
+    def flush(self):
+        self._put(FLUSH)
+
+    def close(self):
+        self._put(_CLOSED)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._queue = asyncio.Queue()
+            for item in self._backlog:
+                self._queue.put_nowait(item)
+            self._backlog = []
+        while True:
+            item = await self._queue.get()
+            if item is _CLOSED:
+                return
+            yield item
@@ -6,6 +6,7 @@ setup(
     version="0.1.0",
     packages=find_packages(),
     install_requires=["snac", "vllm"],
+    entry_points={"console_scripts": ["orpheus_tts=orpheus_tts.__main__:main"]},
     author="Amu Varma",
     author_email="amu@canopylabs.com",
     description="Orpheus Text-to-Speech System",
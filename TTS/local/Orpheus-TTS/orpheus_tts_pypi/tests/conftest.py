@@ -0,0 +1,113 @@
+"""Stand-ins for vLLM, transformers and SNAC so OrpheusModel runs without a GPU.
+
+StubEngine streams audio tokens the way AsyncLLMEngine.generate does: every
+output carries all token ids generated so far. The tokens of a request encode
+its prompt (see ``prompt_code``), so a test can tell whose stream it reads.
+"""
+import asyncio
+import collections
+import sys
+import types
+
+import numpy as np
+import pytest
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+class _Args:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class _Tokenizer:
+    def __call__(self, text, add_special_tokens=True):
+        return types.SimpleNamespace(input_ids=[ord(c) for c in text])
+
+
+_module("vllm", AsyncLLMEngine=types.SimpleNamespace(from_engine_args=lambda args: StubEngine()),
+        AsyncEngineArgs=_Args, SamplingParams=_Args)
+_module("vllm.inputs", TokensPrompt=dict)
+_module("vllm.lora")
+_module("vllm.lora.request", LoRARequest=collections.namedtuple("LoRARequest", "lora_name lora_int_id lora_path"))
+_module("transformers", AutoTokenizer=types.SimpleNamespace(from_pretrained=lambda *args, **kwargs: _Tokenizer()))
+try:
+    import snac  # noqa: F401
+except ImportError:
+    _module("snac", SNAC=None)
+
+from orpheus_tts import OrpheusModel  # noqa: E402
+from orpheus_tts.codec import AUDIO_TOKEN_OFFSET, CODEBOOK_SIZE  # noqa: E402
+from orpheus_tts.decoder import SAMPLES_PER_FRAME  # noqa: E402
+
+
+def prompt_code(prompt_token_ids):
+    """SNAC code that StubEngine repeats for a prompt."""
+    return sum(prompt_token_ids) % (CODEBOOK_SIZE - 1) + 1
+
+
+class StubEngine:
+    def __init__(self, frames=8, step_seconds=0.001):
+        self.frames = frames
+        self.step_seconds = step_seconds
+        self.requests = []
+        self.running = set()
+        self.peak_running = 0
+        self.aborted = []
+        self.fail = set()
+
+    async def generate(self, prompt, sampling_params, request_id, lora_request=None, priority=0):
+        if request_id in self.fail:
+            raise RuntimeError(f"engine error in {request_id}")
+        if request_id in self.running:
+            raise ValueError(f"Request id {request_id} already running.")
+        self.running.add(request_id)
+        self.peak_running = max(self.peak_running, len(self.running))
+        self.requests.append((request_id, priority))
+        code = prompt_code(prompt["prompt_token_ids"])
+        token_ids = []
+        try:
+            for index in range(min(self.frames * 7, sampling_params.max_tokens)):
+                await asyncio.sleep(self.step_seconds)
+                token_ids.append(AUDIO_TOKEN_OFFSET + (index % 7) * CODEBOOK_SIZE + code)
+                yield types.SimpleNamespace(outputs=[types.SimpleNamespace(token_ids=list(token_ids))])
+        finally:
+            self.running.discard(request_id)
+
+    async def abort(self, request_id):
+        self.aborted.append(request_id)
+
+
+class FakeDecoder:
+    """Decodes every frame to 2048 samples valued by the window's first code."""
+
+    def warmup(self, window_frames=4, batch_sizes=None):
+        pass
+
+    async def decode_frames_async(self, multiframe, start=None, end=None):
+        audio = np.full(len(multiframe) // 7 * SAMPLES_PER_FRAME, multiframe[0] / CODEBOOK_SIZE, dtype=np.float32)
+        return audio[start:end]
+
+    def decode_codes(self, codes):
+        return (codes[0][:, :1].float() / CODEBOOK_SIZE).repeat(1, codes[0].shape[1] * SAMPLES_PER_FRAME).unsqueeze(1)
+
+
+@pytest.fixture
+def make_model():
+    models = []
+
+    def make(frames=8, step_seconds=0.001, **kwargs):
+        model = OrpheusModel("stub-model", decoder=FakeDecoder(), **kwargs)
+        model.engine.frames = frames
+        model.engine.step_seconds = step_seconds
+        models.append(model)
+        return model
+
+    yield make
+    for model in models:
+        model.shutdown()
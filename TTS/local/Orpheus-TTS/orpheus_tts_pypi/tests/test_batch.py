@@ -0,0 +1,17 @@
+import json
+import os
+
+from orpheus_tts.batch import BatchSynthesizer, read_items
+
+
+def test_failed_and_duplicate_items_do_not_stop_the_run(make_model, tmp_path):
+    model = make_model(frames=4)
+    model.engine.fail.add("batch-2")
+    items = tmp_path / "items.jsonl"
+    rows = [{"id": i, "text": f"第 {i} 条文本"} for i in range(5)] + [{"id": 3, "text": "重复的编号"}]
+    items.write_text("\n".join(json.dumps(row, ensure_ascii=False) for row in rows), encoding="utf-8")
+
+    stats = BatchSynthesizer(model, str(tmp_path / "out"), audio_format="pcm").run(read_items(str(items)))
+
+    assert (stats["done"], stats["failed"], stats["duplicate"]) == (4, 1, 1)
+    assert sorted(os.listdir(tmp_path / "out")) == ["0.pcm", "1.pcm", "3.pcm", "4.pcm"]
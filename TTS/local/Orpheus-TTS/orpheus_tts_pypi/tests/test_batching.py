@@ -0,0 +1,49 @@
+import asyncio
+
+import numpy as np
+import torch
+
+from orpheus_tts.batching import SNACBatchScheduler
+from orpheus_tts.codec import CODEBOOK_SIZE
+
+
+def fake_decode(codes):
+    """One frame of 4 samples per coarse code, valued by the first code."""
+    return codes[0][:, :1].float().repeat(1, codes[0].shape[1] * 4).unsqueeze(1)
+
+
+def window(code, num_frames=4):
+    return [code] * (num_frames * 7)
+
+
+def test_cancelled_window_leaves_its_batch_alone():
+    scheduler = SNACBatchScheduler(fake_decode, "cpu", max_wait_ms=200)
+    try:
+        futures = [scheduler.submit(window(code)) for code in (1, 2, 3, 4)]
+        futures.append(scheduler.submit(window(CODEBOOK_SIZE)))
+        futures.append(scheduler.submit(window(CODEBOOK_SIZE)))
+        # A stream that goes away cancels its future while the batch is still being collected.
+        assert futures[1].cancel() and futures[5].cancel()
+
+        assert np.array_equal(futures[0].result(timeout=5), np.full(16, 1.0, dtype=np.float32))
+        assert [futures[i].result(timeout=5)[0] for i in (2, 3)] == [3.0, 4.0]
+        assert futures[4].result(timeout=5) is None
+        assert futures[1].cancelled() and futures[5].cancelled()
+        assert scheduler.stats()["batch_sizes"] == {3: 1}
+    finally:
+        scheduler.close()
+
+
+def test_cancelled_awaiter_does_not_break_other_streams():
+    scheduler = SNACBatchScheduler(fake_decode, "cpu", max_wait_ms=100)
+
+    async def main():
+        waiters = [asyncio.wrap_future(scheduler.submit(window(code))) for code in (1, 2, 3, 4)]
+        await asyncio.sleep(0)
+        waiters[0].cancel()
+        return await asyncio.gather(*waiters[1:])
+
+    try:
+        assert [samples[0] for samples in asyncio.run(main())] == [2.0, 3.0, 4.0]
+    finally:
+        scheduler.close()
@@ -0,0 +1,140 @@
+import asyncio
+import collections
+import threading
+import time
+
+import numpy as np
+
+from conftest import FakeDecoder, prompt_code
+from orpheus_tts import OrpheusModel
+from orpheus_tts.codec import AUDIO_TOKEN_OFFSET, CODEBOOK_SIZE
+from orpheus_tts.decoder import SAMPLES_PER_FRAME, to_pcm16
+
+
+def test_parallel_generate_speech_gets_distinct_requests(make_model):
+    model = make_model(frames=8, step_seconds=0.002)
+    prompts = [f"第 {i} 句话" for i in range(8)]
+    tokens = collections.defaultdict(list)
+    audio = {}
+
+    def synthesize(prompt):
+        # No request_id is passed: each call must get its own.
+        audio[prompt] = b"".join(model.generate_speech(
+            prompt=prompt, voice="tara", on_token=lambda request_id, token_id: tokens[request_id].append((prompt, token_id))))
+
+    threads = [threading.Thread(target=synthesize, args=(prompt,)) for prompt in prompts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    request_ids = [request_id for request_id, _ in model.engine.requests]
+    assert len(set(request_ids)) == len(prompts)
+    assert model.engine.peak_running > 1
+    assert set(tokens) == set(request_ids)
+    for request_id, stream in tokens.items():
+        (prompt,) = {prompt for prompt, _ in stream}
+        code = prompt_code(model._format_prompt(prompt, "tara")["prompt_token_ids"])
+        assert [token_id for _, token_id in stream] == [
+            AUDIO_TOKEN_OFFSET + (index % 7) * CODEBOOK_SIZE + code for index in range(8 * 7)]
+    # Every frame after the first (left context only) comes back as 16-bit PCM.
+    assert all(len(pcm) == 7 * SAMPLES_PER_FRAME * 2 for pcm in audio.values())
+    assert not model.engine.running
+
+
+def test_parallel_generate_speech_async_streams_stay_apart(make_model):
+    model = make_model(frames=8, step_seconds=0.002)
+    prompts = [f"line {i}" for i in range(8)]
+
+    async def synthesize(prompt):
+        return [chunk async for chunk in model.generate_speech_async(prompt=prompt, voice="tara")]
+
+    async def main():
+        return await asyncio.gather(*(synthesize(prompt) for prompt in prompts))
+
+    results = asyncio.run(main())
+
+    assert len({request_id for request_id, _ in model.engine.requests}) == len(prompts)
+    assert model.engine.peak_running > 1
+    for prompt, chunks in zip(prompts, results):
+        # FakeDecoder fills a window with its first code, so the samples name the prompt.
+        code = prompt_code(model._format_prompt(prompt, "tara")["prompt_token_ids"])
+        assert b"".join(chunks) == to_pcm16(np.full(7 * SAMPLES_PER_FRAME, code / CODEBOOK_SIZE, dtype=np.float32))
+
+
+def test_cancel_matches_exact_id_and_own_segments_only(make_model):
+    # Under the budget's 48-frame repeat window, so only cancel() ends requests early.
+    model = make_model(frames=40, step_seconds=0.005)
+    stops = collections.defaultdict(list)
+
+    async def synthesize(request_id, segmented):
+        on_stop = lambda request_id, reason: stops[request_id].append(reason)  # noqa: E731
+        if segmented:
+            audio = model.generate_speech_segments_async(prompt="这是第一句比较长的话。这是第二句比较长的话。", voice="tara", request_id=request_id, on_stop=on_stop)
+        else:
+            audio = model.generate_speech_async(prompt="另一个请求的文本内容。", voice="tara", request_id=request_id, on_stop=on_stop)
+        return len([chunk async for chunk in audio])
+
+    async def main():
+        # "tts-3" and "tts-7f" look like segments of "tts" but belong to other replies.
+        tasks = [asyncio.ensure_future(synthesize(request_id, request_id == "tts")) for request_id in ("tts", "tts-3", "tts-7f")]
+        while len(model.engine.running) < 4:
+            await asyncio.sleep(0.005)
+        assert model.cancel("tts")
+        return await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+    assert sorted(model.engine.aborted) == ["tts-0", "tts-1"]
+    assert stops == {"tts": ["cancelled", "cancelled"]}
+    assert not model.cancel("tts")
+    assert model.abort_stats["aborted_requests"] == 2
+
+
+def test_cuda_graph_capture_waits_for_the_engine(monkeypatch):
+    events = []
+    setup_engine = OrpheusModel._setup_engine
+
+    def slow_setup_engine(self):
+        time.sleep(0.05)
+        engine = setup_engine(self)
+        events.append("engine")
+        return engine
+
+    class CapturingDecoder(FakeDecoder):
+        def __init__(self, compile):
+            self.compile = compile
+
+        def warmup(self, window_frames=4, batch_sizes=None):
+            events.append(f"warmup {self.compile}")
+
+    monkeypatch.setattr(OrpheusModel, "_setup_engine", slow_setup_engine)
+    OrpheusModel("stub-model", decoder=CapturingDecoder("cuda_graph")).shutdown()
+    OrpheusModel("stub-model", decoder=CapturingDecoder(None)).shutdown()
+
+    # Eager SNAC warms up alongside the engine; a CUDA graph capture only after it.
+    assert events == ["engine", "warmup cuda_graph", "warmup None", "engine"]
+
+
+def test_async_generation_rescans_adapters_off_the_loop(make_model, tmp_path, monkeypatch):
+    (tmp_path / "zoe").mkdir()
+    (tmp_path / "zoe" / "adapter_config.json").write_text("{}")
+    model = make_model(frames=2, lora_dir=str(tmp_path))
+    refresh = model.loras.refresh
+    threads = []
+
+    def recording_refresh():
+        threads.append(threading.current_thread())
+        refresh()
+
+    monkeypatch.setattr(model.loras, "refresh", recording_refresh)
+
+    async def main():
+        tokens = [token_id async for token_id in model.generate_tokens_async(prompt="hello there", voice="zoe")]
+        return tokens, threading.current_thread()
+
+    tokens, loop_thread = asyncio.run(main())
+
+    assert len(tokens) == 2 * 7
+    assert threads and loop_thread not in threads
+    assert model.loras.names == ["zoe"]
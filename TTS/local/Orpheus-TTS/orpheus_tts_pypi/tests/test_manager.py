@@ -0,0 +1,49 @@
+from conftest import FakeDecoder
+from orpheus_tts import ModelManager
+
+
+def make_manager(**kwargs):
+    specs = {name: {"model_name": f"stub-{name}", "decoder": FakeDecoder()} for name in ("a", "b")}
+    return ModelManager(specs, max_resident=1, **kwargs)
+
+
+def shutdown(manager):
+    for entry in manager._entries.values():
+        if entry.model is not None:
+            entry.model.shutdown()
+
+
+def test_engine_without_shutdown_or_sleep_is_not_reported_unloaded():
+    # StubEngine, like the in-process V0 AsyncLLMEngine, has no shutdown().
+    manager = make_manager()
+    try:
+        manager.acquire("a").release()
+        assert not manager.evict("a")
+        manager.acquire("b").release()
+
+        stats = manager.stats()
+        assert stats["a"]["resident"] and not stats["a"]["evictable"]
+        assert stats["a"]["evictions"] == 0
+        assert stats["b"]["resident"]
+    finally:
+        shutdown(manager)
+
+
+def test_engine_without_shutdown_is_put_to_sleep():
+    manager = make_manager()
+    slept = []
+    try:
+        lease = manager.acquire("a")
+        lease.release()
+
+        async def sleep(level):
+            slept.append(level)
+
+        lease.model.engine.sleep = sleep
+        manager.acquire("b").release()
+
+        assert slept == [1]
+        assert manager._entries["a"].state == "sleeping"
+        assert manager.stats()["a"]["sleeps"] == 1
+    finally:
+        shutdown(manager)
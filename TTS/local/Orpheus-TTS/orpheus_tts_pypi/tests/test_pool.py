@@ -0,0 +1,94 @@
+import asyncio
+
+from orpheus_tts import EnginePool, GenerationBudget
+
+
+class FakeReplica:
+    """Yields one chunk per call and remembers what it was asked for."""
+
+    def __init__(self):
+        self.budget = GenerationBudget()
+        self.calls = []
+
+    def generate_speech(self, **kwargs):
+        self.calls.append(kwargs)
+        yield b"\0\0"
+
+    async def generate_speech_async(self, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(0)
+        yield b"\0\0"
+
+    def cancel(self, request_id):
+        return False
+
+
+def start(pool, **kwargs):
+    """Route a request and keep it in flight; close() the result to finish it."""
+    audio = pool.generate_speech(**kwargs)
+    next(audio)
+    return audio
+
+
+def test_equal_requests_spread_evenly():
+    pool = EnginePool([FakeReplica() for _ in range(4)], affinity_slack=0)
+    in_flight = [start(pool, prompt="hello", voice=f"voice-{i}", max_tokens=200) for i in range(24)]
+
+    assert pool.stats() == [{"outstanding_tokens": 1200, "routed": 6}] * 4
+
+    for audio in in_flight:
+        audio.close()
+    assert [replica["outstanding_tokens"] for replica in pool.stats()] == [0, 0, 0, 0]
+
+
+def test_routes_to_least_outstanding_tokens():
+    pool = EnginePool([FakeReplica() for _ in range(4)], affinity_slack=0)
+    costs = [100 * (i % 3 + 1) for i in range(24)]
+    in_flight = [start(pool, prompt="hello", voice=f"voice-{i}", max_tokens=cost) for i, cost in enumerate(costs)]
+
+    # Greedy least-loaded routing keeps replicas within one request of each other.
+    outstanding = [replica["outstanding_tokens"] for replica in pool.stats()]
+    assert sum(outstanding) == sum(costs)
+    assert max(outstanding) - min(outstanding) <= max(costs)
+    assert sum(replica["routed"] for replica in pool.stats()) == 24
+
+    # As requests finish, the next one still goes to the least loaded replica.
+    for audio in in_flight[::4]:
+        audio.close()
+    stats = pool.stats()
+    least = min(range(4), key=lambda index: stats[index]["outstanding_tokens"])
+    start(pool, prompt="hello", voice="new", max_tokens=100).close()
+    assert pool.stats()[least]["routed"] == stats[least]["routed"] + 1
+
+
+def test_voice_sticks_to_its_replica_within_slack():
+    replicas = [FakeReplica() for _ in range(2)]
+    pool = EnginePool(replicas, affinity_slack=1000)
+    in_flight = [start(pool, prompt="hello", voice="zoe", lang="en", max_tokens=200) for _ in range(4)]
+
+    assert len(replicas[0].calls) == 4 and not replicas[1].calls
+
+    # Over the slack the voice moves to the least loaded replica, and stays there.
+    in_flight += [start(pool, prompt="hello", voice="zoe", lang="en", max_tokens=200) for _ in range(3)]
+    assert len(replicas[0].calls) == 6 and len(replicas[1].calls) == 1
+    in_flight.append(start(pool, prompt="hello", voice="zoe", lang="en", max_tokens=200))
+    assert len(replicas[1].calls) == 2
+
+    for audio in in_flight:
+        audio.close()
+
+
+def test_concurrent_async_streams_balance_and_release():
+    pool = EnginePool([FakeReplica() for _ in range(4)], affinity_slack=0)
+
+    async def synthesize(i):
+        return [chunk async for chunk in pool.generate_speech_async(prompt="你好" * (i % 5 + 1), voice="白芷", lang="zh")]
+
+    async def main():
+        return await asyncio.gather(*(synthesize(i) for i in range(40)))
+
+    assert all(chunks == [b"\0\0"] for chunks in asyncio.run(main()))
+    stats = pool.stats()
+    assert sum(replica["routed"] for replica in stats) == 40
+    assert all(replica["routed"] >= 5 for replica in stats)
+    assert all(replica["outstanding_tokens"] == 0 for replica in stats)
@@ -0,0 +1,33 @@
+from orpheus_tts import TextChunker, split_text
+
+
+def feed_all(chunker, deltas):
+    units = []
+    for delta in deltas:
+        units.extend(chunker.feed(delta))
+    return units + chunker.flush()
+
+
+def test_number_split_across_deltas_stays_whole():
+    units = feed_all(TextChunker(), ["The total price is 12", ",", "000 dollars and 50 cents. Thanks"])
+    assert units == ["The total price is 12,000 dollars and 50 cents.", "Thanks"]
+
+
+def test_time_is_not_a_clause_end():
+    units = feed_all(TextChunker(), ["The meeting starts at 10", ":", "30 tomorrow, so please be early. OK"])
+    assert units == ["The meeting starts at 10:30 tomorrow, so please be early.", "OK"]
+
+
+def test_clause_end_waits_for_the_next_character():
+    chunker = TextChunker()
+    assert chunker.feed("今天下午三点我们在会议室开会，") == []
+    assert chunker.feed("请") == ["今天下午三点我们在会议室开会，"]
+
+
+def test_overflow_cut_skips_digit_commas():
+    chunker = TextChunker(max_chars=36, first_clause_chars=100)
+    assert chunker.feed("Over the year, costs were 1,250,000 dollars in total") == ["Over the year,"]
+
+
+def test_split_text_keeps_numbers_and_times():
+    assert split_text("会议在10:30开始，预算是12,000元，请准时到场。", max_chars=20, min_chars=4) == ["会议在10:30开始，", "预算是12,000元，请准时到场。"]
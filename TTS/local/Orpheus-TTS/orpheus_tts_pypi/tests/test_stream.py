@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from conftest import prompt_code
+from orpheus_tts import TextFeed
+from orpheus_tts.codec import CODEBOOK_SIZE
+from orpheus_tts.decoder import SAMPLES_PER_FRAME, to_pcm16
+
+
+def test_first_chunk_arrives_before_feed_closes(make_model):
+    model = make_model(frames=8, step_seconds=0.002)
+    feed = TextFeed()
+
+    async def main():
+        audio = model.generate_speech_stream_async(text_stream=feed, voice="tara")
+        # The sentence end is trusted once the next delta arrives.
+        feed.put("今天的天气")
+        feed.put("非常不错。明天")
+        # The feed is still open: audio for the first sentence must not wait for the rest.
+        first = await asyncio.wait_for(audio.__anext__(), timeout=5)
+        assert len(model.engine.requests) == 1
+
+        feed.put("可能会下一场大雨。")
+        feed.close()
+        return [first] + [chunk async for chunk in audio]
+
+    chunks = asyncio.run(main())
+
+    assert [request_id.rsplit("-", 1)[1] for request_id, _ in model.engine.requests] == ["0", "1"]
+    # Audio comes back in text order; FakeDecoder fills each segment with its prompt's code.
+    expected = [
+        to_pcm16(np.full(7 * SAMPLES_PER_FRAME, prompt_code(model._format_prompt(segment, "tara")["prompt_token_ids"]) / CODEBOOK_SIZE, dtype=np.float32))
+        for segment in ("今天的天气非常不错。", "明天可能会下一场大雨。")
+    ]
+    assert b"".join(chunks) == b"".join(expected)
+
+
+def test_sync_stream_follows_a_producer_thread(make_model):
+    model = make_model(frames=8, step_seconds=0.002)
+    feed = TextFeed()
+    first_chunk = threading.Event()
+    closed_after_first = []
+
+    def produce():
+        feed.put("这是流式输入的第一句话。")
+        feed.flush()
+        first_chunk.wait(timeout=5)
+        feed.put("这是流式输入的第二句话。")
+        closed_after_first.append(first_chunk.is_set())
+        feed.close()
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    chunks = []
+    for chunk in model.generate_speech_stream(text_stream=feed, voice="tara"):
+        chunks.append(chunk)
+        first_chunk.set()
+    producer.join()
+
+    assert closed_after_first == [True]
+    assert len(model.engine.requests) == 2
@@ -0,0 +1,117 @@
+import collections
+import math
+import threading
+import time
+
+
+class Rejected(Exception):
+    """Raised when a request cannot be admitted; carries the HTTP status and a retry hint."""
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Slot:
+    """An admitted request. release() is idempotent so it can be wired to several close paths."""
+
+    def __init__(self, controller, wait):
+        self.controller = controller
+        self.wait = wait
+        self.started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        self.controller._release(self)
+
+
+class AdmissionController:
+    """Bounded FIFO admission in front of the engine.
+
+    At most ``max_active`` requests run at once and at most ``max_queue`` wait
+    for a slot. A full queue is rejected immediately (429); a request that
+    waits longer than ``max_wait`` seconds is rejected with 503, since by then
+    it could no longer meet its latency target anyway. Rejections carry a
+    Retry-After estimate from the recent service time.
+    """
+
+    def __init__(self, max_active=8, max_queue=32, max_wait=1.0):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._active = 0
+        self._waiting = collections.deque()
+        self._cond = threading.Condition()
+        self._service_time = 1.0  # moving average of seconds a slot is held
+        self.counters = {
+            "admitted": 0,
+            "rejected_full": 0,
+            "rejected_timeout": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def _retry_after(self):
+        backlog = len(self._waiting) + 1
+        return max(1, math.ceil(self._service_time * backlog / self.max_active))
+
+    def _admit(self, wait):
+        self._active += 1
+        self.counters["admitted"] += 1
+        self.counters["wait_seconds_total"] += wait
+        self.counters["wait_seconds_max"] = max(self.counters["wait_seconds_max"], wait)
+        return Slot(self, wait)
+
+    def try_acquire(self):
+        """Return a slot if one is free and nobody is queued, else None without waiting."""
+        with self._cond:
+            if self._active < self.max_active and not self._waiting:
+                return self._admit(0.0)
+        return None
+
+    def acquire(self):
+        """Wait for a slot and return it, or raise Rejected."""
+        start = time.monotonic()
+        with self._cond:
+            if self._active < self.max_active and not self._waiting:
+                return self._admit(0.0)
+            if len(self._waiting) >= self.max_queue:
+                self.counters["rejected_full"] += 1
+                raise Rejected(429, "queue_full", self._retry_after())
+            ticket = object()
+            self._waiting.append(ticket)
+            try:
+                while not (self._active < self.max_active and self._waiting[0] is ticket):
+                    remaining = start + self.max_wait - time.monotonic()
+                    if remaining <= 0:
+                        self.counters["rejected_timeout"] += 1
+                        raise Rejected(503, "queue_timeout", self._retry_after())
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+            return self._admit(time.monotonic() - start)
+
+    def _release(self, slot):
+        with self._cond:
+            if slot._released:
+                return
+            slot._released = True
+            self._active -= 1
+            held = time.monotonic() - slot.started
+            self._service_time = 0.9 * self._service_time + 0.1 * held
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self.counters)
+            stats.update(
+                active=self._active,
+                queue_depth=len(self._waiting),
+                max_active=self.max_active,
+                max_queue=self.max_queue,
+                service_seconds=self._service_time,
+            )
+        return stats
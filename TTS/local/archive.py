@@ -0,0 +1,132 @@
+import os
+import queue
+import struct
+import threading
+import time
+
+
+class Archive:
+    """One WAV file being archived; returned by ArchiveWriter.open()."""
+
+    def __init__(self, writer, path, header):
+        self.writer = writer
+        self.path = path
+        self.header = header
+        self.bytes_queued = 0
+        self.truncated = False
+        self._file = None
+        self._bytes_written = 0
+
+    def write(self, chunk):
+        """Hand the chunk object to the writer thread; it is queued, not copied."""
+        self.bytes_queued += len(chunk)
+        self.writer._submit(self, chunk)
+
+    def close(self):
+        self.writer._queue.put(("close", self, None))
+
+
+class ArchiveWriter:
+    """Archives streamed audio to disk on a single background thread.
+
+    Response generators only enqueue chunks, so a slow disk never delays the
+    audio sent to the caller. At most ``max_pending_bytes`` may wait in the
+    queue. Past that, ``policy="drop"`` drops the chunk and stops archiving
+    that file (a file with a hole in it is useless). ``policy="block"`` makes
+    the producer wait instead. The WAV header is patched with the final size
+    when the file is closed.
+    """
+
+    def __init__(self, max_pending_bytes=64 * 1024 * 1024, policy="drop"):
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unknown policy {policy!r}, expected 'drop' or 'block'")
+        self.max_pending_bytes = max_pending_bytes
+        self.policy = policy
+        self._queue = queue.Queue()
+        self._pending_bytes = 0
+        self._cond = threading.Condition()
+        self.counters = {
+            "files": 0,
+            "truncated_files": 0,
+            "bytes_written": 0,
+            "dropped_bytes": 0,
+            "blocked_seconds": 0.0,
+            "errors": 0,
+        }
+        self._thread = threading.Thread(target=self._run, name="archive-writer", daemon=True)
+        self._thread.start()
+
+    def open(self, path, header):
+        archive = Archive(self, path, header)
+        self._queue.put(("open", archive, None))
+        return archive
+
+    def _submit(self, archive, chunk):
+        with self._cond:
+            if archive.truncated:
+                self.counters["dropped_bytes"] += len(chunk)
+                return
+            if self._pending_bytes + len(chunk) > self.max_pending_bytes:
+                if self.policy == "drop":
+                    archive.truncated = True
+                    self.counters["dropped_bytes"] += len(chunk)
+                    return
+                started = time.monotonic()
+                while self._pending_bytes + len(chunk) > self.max_pending_bytes and self._pending_bytes:
+                    self._cond.wait()
+                self.counters["blocked_seconds"] += time.monotonic() - started
+            self._pending_bytes += len(chunk)
+        self._queue.put(("write", archive, chunk))
+
+    def _run(self):
+        while True:
+            op, archive, chunk = self._queue.get()
+            if op is None:
+                return
+            try:
+                if op == "open":
+                    os.makedirs(os.path.dirname(archive.path) or ".", exist_ok=True)
+                    archive._file = open(archive.path, "wb")
+                    archive._file.write(archive.header)
+                    self.counters["files"] += 1
+                elif op == "write":
+                    if archive._file is not None:
+                        archive._file.write(chunk)
+                        archive._bytes_written += len(chunk)
+                        self.counters["bytes_written"] += len(chunk)
+                elif op == "close" and archive._file is not None:
+                    self._finish(archive)
+            except OSError as e:
+                print(f"Failed to archive {archive.path}: {e}")
+                self.counters["errors"] += 1
+                if archive._file is not None:
+                    archive._file.close()
+                    archive._file = None
+            finally:
+                if op == "write":
+                    with self._cond:
+                        self._pending_bytes -= len(chunk)
+                        self._cond.notify_all()
+
+    def _finish(self, archive):
+        # Patch the RIFF and data chunk sizes with what actually reached the file.
+        f = archive._file
+        f.seek(4)
+        f.write(struct.pack('<I', 36 + archive._bytes_written))
+        f.seek(40)
+        f.write(struct.pack('<I', archive._bytes_written))
+        f.close()
+        archive._file = None
+        if archive.truncated:
+            self.counters["truncated_files"] += 1
+
+    def close(self):
+        """Write out everything queued, then stop the thread."""
+        self._queue.put((None, None, None))
+        self._thread.join()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self.counters)
+            stats.update(pending_bytes=self._pending_bytes, queued_ops=self._queue.qsize())
+        return stats
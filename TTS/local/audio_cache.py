@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """NFKC-normalize and collapse whitespace so trivially different prompts share an entry."""
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.split())
+
+
+class AudioCache:
+    """Content-addressed cache of synthesized PCM with a memory LRU and a disk tier.
+
+    Entries are keyed on everything that changes the audio (text, voice, lang,
+    sampling params, model). Both tiers evict least-recently-used entries once
+    their byte budget is exceeded; memory evictions stay on disk.
+    """
+
+    def __init__(self, directory="./cache/orpheus", memory_bytes=256 * 1024 * 1024, disk_bytes=4 * 1024 * 1024 * 1024, chunk_size=4096):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.chunk_size = chunk_size
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = OrderedDict()
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+        os.makedirs(directory, exist_ok=True)
+        self._scan_disk()
+
+    @staticmethod
+    def make_key(text, voice, lang, params, model):
+        payload = json.dumps(
+            [normalize_text(text), voice, lang, params, model],
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".pcm")
+
+    def _scan_disk(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".pcm"):
+                    st = os.stat(os.path.join(root, name))
+                    entries.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+
+    def get(self, key):
+        with self._lock:
+            pcm = self._memory.get(key)
+            if pcm is not None:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return pcm
+            if key not in self._disk:
+                self.counters["misses"] += 1
+                return None
+            self._disk.move_to_end(key)
+
+        try:
+            with open(self._path(key), "rb") as f:
+                pcm = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._disk_size -= self._disk.pop(key, 0)
+                self.counters["misses"] += 1
+            return None
+        os.utime(self._path(key))
+
+        with self._lock:
+            self.counters["disk_hits"] += 1
+            self._remember(key, pcm)
+        return pcm
+
+    def put(self, key, pcm):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(pcm)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._remember(key, pcm)
+            self._disk_size += len(pcm) - self._disk.pop(key, 0)
+            self._disk[key] = len(pcm)
+            while self._disk_size > self.disk_bytes and len(self._disk) > 1:
+                old_key, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+                self.counters["disk_evictions"] += 1
+                try:
+                    os.remove(self._path(old_key))
+                except FileNotFoundError:
+                    pass
+
+    def _remember(self, key, pcm):
+        if len(pcm) > self.memory_bytes:
+            return
+        self._memory_size += len(pcm) - len(self._memory.pop(key, b""))
+        self._memory[key] = pcm
+        while self._memory_size > self.memory_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_size -= len(old)
+            self.counters["memory_evictions"] += 1
+
+    def chunks(self, pcm):
+        """Replay cached PCM with the same chunk size as a live synthesis."""
+        for i in range(0, len(pcm), self.chunk_size):
+            yield pcm[i:i + self.chunk_size]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update(
+                memory_entries=len(self._memory),
+                memory_bytes=self._memory_size,
+                disk_entries=len(self._disk),
+                disk_bytes=self._disk_size,
+            )
+        return stats
@@ -0,0 +1,202 @@
+import argparse
+import itertools
+import threading
+import time
+
+import requests
+
+SENTENCES = [
+    "您好，这里是售后服务中心。",
+    "请先确认电脑已经连接电源适配器。",
+    "长按电源键十秒钟，然后松开。",
+    "等待大约三十秒后，再次按下电源键开机。",
+    "如果屏幕仍然没有显示，请外接一台显示器试试。",
+    "外接显示器有画面的话，可能是屏幕排线松动。",
+    "这种情况建议您携带设备到就近的服务站检测。",
+    "服务站的地址可以在官网的服务网点页面查询。",
+    "检测和保修期内的维修都是免费的。",
+    "请问还有其他可以帮您的吗？",
+]
+
+
+_request_numbers = itertools.count(1)
+
+
+def fresh_prompt(prompt):
+    """在句首加上请求编号，每个请求的文本都不同。
+
+    服务端按文本缓存完整音频，重复发送同一文本从第二次起就是缓存回放，测不到引擎；
+    编号放在句首，第一句也不会命中 vLLM 的前缀缓存
+    """
+    return f"{next(_request_numbers)}号，{prompt}"
+
+
+def measure_ttfa(base_url, prompt, voice, lang):
+    """Return (time to first audio byte after the WAV header, total time) in seconds."""
+    start = time.time()
+    first_audio = None
+    received = 0
+    with requests.get(f"{base_url}/tts", params={"prompt": fresh_prompt(prompt), "voice": voice, "lang": lang}, stream=True) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=None):
+            received += len(chunk)
+            # 前 44 字节是 WAV 头
+            if first_audio is None and received > 44:
+                first_audio = time.time() - start
+    return first_audio, time.time() - start
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def read_proc_status(pid):
+    """服务进程的线程数和常驻内存（MB），读取 /proc，仅支持 Linux"""
+    threads, rss = 0, 0.0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("Threads:"):
+                threads = int(line.split()[1])
+            elif line.startswith("VmRSS:"):
+                rss = int(line.split()[1]) / 1024
+    return threads, rss
+
+
+def stream_chunks(base_url, prompt, voice, lang, priority="interactive"):
+    """返回 (首包延迟, 相邻音频块间隔列表)，单位秒"""
+    start = time.time()
+    last = None
+    first_audio = None
+    gaps = []
+    received = 0
+    params = {"prompt": fresh_prompt(prompt), "voice": voice, "lang": lang, "priority": priority}
+    with requests.get(f"{base_url}/tts", params=params, stream=True) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=None):
+            received += len(chunk)
+            if received <= 44:
+                continue
+            now = time.time()
+            if first_audio is None:
+                first_audio = now - start
+            else:
+                gaps.append(now - last)
+            last = now
+    return first_audio, gaps
+
+
+def start_clients(args, prompt, count, priority, until=None):
+    """启动 count 个客户端线程，返回 (线程列表, 结果)。
+
+    until 为 None 时每个客户端发 args.repeat 个请求，否则一直发到 until 被 set
+    """
+    results = {"ttfas": [], "gaps": [], "errors": []}
+    lock = threading.Lock()
+
+    def client():
+        done = 0
+        while (done < args.repeat) if until is None else not until.is_set():
+            done += 1
+            try:
+                ttfa, chunk_gaps = stream_chunks(args.url, prompt, args.voice, args.lang, priority)
+            except requests.RequestException as e:
+                with lock:
+                    results["errors"].append(e)
+                continue
+            with lock:
+                results["ttfas"].append(ttfa)
+                results["gaps"].extend(chunk_gaps)
+
+    clients = [threading.Thread(target=client) for _ in range(count)]
+    for t in clients:
+        t.start()
+    return clients, results
+
+
+def wait_clients(clients, server_pid):
+    """等待客户端结束，返回 (耗时, 服务端线程数峰值, 内存峰值 MB)"""
+    peak_threads, peak_rss = 0, 0.0
+    start = time.time()
+    while any(t.is_alive() for t in clients):
+        if server_pid:
+            threads, rss = read_proc_status(server_pid)
+            peak_threads, peak_rss = max(peak_threads, threads), max(peak_rss, rss)
+        time.sleep(0.1)
+    return time.time() - start, peak_threads, peak_rss
+
+
+def run_concurrency(args):
+    """并发压测：同时发起 --concurrency 个请求，统计首包、块间隔 p99 以及服务端线程数和内存峰值"""
+    prompt = "".join(SENTENCES[:3])
+    clients, results = start_clients(args, prompt, args.concurrency, "interactive")
+    elapsed, peak_threads, peak_rss = wait_clients(clients, args.server_pid)
+    ttfas, gaps = results["ttfas"], results["gaps"]
+
+    print(f"并发 {args.concurrency}: {len(ttfas)} 个请求成功, {len(results['errors'])} 个失败, 耗时 {elapsed:.1f} s")
+    print(f"  TTFA p50 {percentile(ttfas, 0.5) * 1000:.0f} ms, p99 {percentile(ttfas, 0.99) * 1000:.0f} ms")
+    print(f"  音频块间隔 p50 {percentile(gaps, 0.5) * 1000:.0f} ms, p99 {percentile(gaps, 0.99) * 1000:.0f} ms")
+    if args.server_pid:
+        print(f"  服务端线程数峰值 {peak_threads}, 内存峰值 {peak_rss:.0f} MB")
+
+    if args.batch_clients:
+        run_mixed(args, prompt, ttfas)
+
+
+def run_mixed(args, prompt, baseline_ttfas):
+    """混合负载：同样的交互请求，外加 --batch-clients 个长文本批量客户端持续施压。
+
+    批量请求用 --batch-priority 提交（默认 batch）；优先级调度生效时，交互请求的首包 p99
+    应与上面单独运行时基本持平。改用 --batch-priority interactive 可以看到不区分优先级时的对照。
+    """
+    stop = threading.Event()
+    batch_clients, batch = start_clients(args, "".join(SENTENCES), args.batch_clients, args.batch_priority, until=stop)
+    # 等批量请求先占满引擎，再开始测交互请求
+    time.sleep(args.batch_ramp)
+    clients, results = start_clients(args, prompt, args.concurrency, "interactive")
+    elapsed, peak_threads, peak_rss = wait_clients(clients, args.server_pid)
+    stop.set()
+    for t in batch_clients:
+        t.join()
+    ttfas = results["ttfas"]
+    base_p99, p99 = percentile(baseline_ttfas, 0.99), percentile(ttfas, 0.99)
+
+    print(f"混合 交互 {args.concurrency} + 批量 {args.batch_clients}（priority={args.batch_priority}）: "
+          f"交互 {len(ttfas)} 个成功, {len(results['errors'])} 个失败, 耗时 {elapsed:.1f} s")
+    print(f"  交互 TTFA p50 {percentile(ttfas, 0.5) * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms, "
+          f"相比单独运行 p99 {(p99 - base_p99) * 1000:+.0f} ms ({p99 / base_p99 if base_p99 else 0:.2f}x)")
+    print(f"  批量完成 {len(batch['ttfas'])} 个请求, {len(batch['errors'])} 个失败, "
+          f"批量 TTFA p50 {percentile(batch['ttfas'], 0.5) * 1000:.0f} ms")
+    if args.server_pid:
+        print(f"  服务端线程数峰值 {peak_threads}, 内存峰值 {peak_rss:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Orpheus TTS 首包延迟测试")
+    parser.add_argument("--url", default="http://127.0.0.1:8090")
+    parser.add_argument("--voice", default="白芷")
+    parser.add_argument("--lang", default="zh")
+    parser.add_argument("--repeat", type=int, default=3)
+    # 分别对 server_orpheus.py（Flask）和 server_orpheus_async.py（ASGI）运行，对比线程数、内存和块间隔 p99
+    parser.add_argument("--concurrency", type=int, default=0, help="并发压测的客户端数，0 表示只测首包延迟")
+    parser.add_argument("--server-pid", type=int, default=None, help="服务进程 PID，用于采样线程数和内存")
+    # 并发压测之后再跑一轮混合负载，对比交互请求的首包 p99
+    parser.add_argument("--batch-clients", type=int, default=0, help="混合负载中持续发送长文本的批量客户端数，0 表示不跑")
+    parser.add_argument("--batch-priority", default="batch", choices=["interactive", "normal", "batch"], help="批量客户端使用的优先级")
+    parser.add_argument("--batch-ramp", type=float, default=2.0, help="批量客户端先运行的秒数，之后再开始交互请求")
+    args = parser.parse_args()
+
+    if args.concurrency:
+        run_concurrency(args)
+        return
+
+    for n in (1, 3, 10):
+        prompt = "".join(SENTENCES[:n])
+        results = [measure_ttfa(args.url, prompt, args.voice, args.lang) for _ in range(args.repeat)]
+        ttfa = sorted(r[0] for r in results)[len(results) // 2]
+        total = sorted(r[1] for r in results)[len(results) // 2]
+        print(f"{n:>2} 句: TTFA {ttfa * 1000:.0f} ms, 总耗时 {total:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
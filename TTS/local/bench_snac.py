@@ -0,0 +1,210 @@
+"""SNAC 解码基准，不需要 vLLM，CPU 上也能运行。
+
+    python bench_snac.py window --window 1,1,2 --window 1,4,2
+    python bench_snac.py window --device cuda --model model/snac_24khz
+    python bench_snac.py compile --batch 1 --batch 8
+    python bench_snac.py codec --frames 4 --frames 64
+
+离线环境可加 --random-init：计算量和耗时与权重取值无关，用随机初始化的 snac_24khz 结构即可。
+"""
+import argparse
+import time
+
+import torch
+from snac import SNAC
+from torch.utils.flop_counter import FlopCounterMode
+
+from orpheus_tts.codec import codes_to_token_ids, deinterleave, interleave, remove_slot_offsets
+from orpheus_tts.compiled import make_decode
+from orpheus_tts.decoder import SAMPLE_RATE, SAMPLES_PER_FRAME, StreamWindow
+
+# hubertsiuzdak/snac_24khz 的 config.json
+SNAC_24KHZ_CONFIG = dict(
+    sampling_rate=24000,
+    encoder_dim=48,
+    encoder_rates=[2, 4, 8, 8],
+    decoder_dim=1024,
+    decoder_rates=[8, 8, 4, 2],
+    attn_window_size=None,
+    codebook_size=4096,
+    codebook_dim=8,
+    vq_strides=[4, 2, 1],
+    noise=True,
+    depthwise=True,
+)
+
+
+def load_snac(args):
+    if args.random_init:
+        model = SNAC(**SNAC_24KHZ_CONFIG)
+    else:
+        model = SNAC.from_pretrained(args.model)
+    return model.eval().to(args.device)
+
+
+def random_codes(batch, num_frames, device):
+    """每帧 1/2/4 个三层码本的随机码，形状与流式解码窗口相同"""
+    return [torch.randint(0, 4096, (batch, num_frames * 2 ** level), dtype=torch.int32, device=device) for level in range(3)]
+
+
+def synchronize(device):
+    if torch.device(device).type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def time_call(fn, device, repeat, warmup=3):
+    """平均每次调用耗时（秒），CUDA 上会等待 kernel 执行完"""
+    for _ in range(warmup):
+        fn()
+    synchronize(device)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    synchronize(device)
+    return (time.perf_counter() - started) / repeat
+
+
+def run_window(args):
+    """每秒音频的 SNAC 解码 FLOPs 和解码耗时：窗口每 hop_frames 帧解码一次"""
+    model = load_snac(args)
+    frames_per_second = SAMPLE_RATE / SAMPLES_PER_FRAME
+    results = []
+    for spec in args.window or ["1,1,2", "1,4,2"]:
+        window = StreamWindow(*(int(n) for n in spec.split(",")))
+        codes = random_codes(1, window.window_frames, args.device)
+        # FlopCounterMode 不支持 inference_mode 下的 weight_norm 参数化，计数时用 no_grad
+        with torch.no_grad(), FlopCounterMode(display=False) as counter:
+            model.decode(codes)
+        with torch.inference_mode():
+            seconds = time_call(lambda: model.decode(codes), args.device, args.repeat)
+        windows_per_second = frames_per_second / window.hop_frames
+        flops = counter.get_total_flops() * windows_per_second
+        busy = seconds * windows_per_second
+        results.append((spec, flops, busy))
+        print(f"窗口 {spec}: 每帧解码 {window.redundancy:.2f} 次, 单次解码 {seconds * 1000:.1f} ms, "
+              f"每秒音频 {flops / 1e9:.1f} GFLOPs / 解码耗时 {busy * 1000:.0f} ms")
+
+    base_spec, base_flops, base_busy = results[0]
+    for spec, flops, busy in results[1:]:
+        print(f"{spec} 相比 {base_spec}: 每秒音频节省 {(base_flops - flops) / 1e9:.1f} GFLOPs "
+              f"({1 - flops / base_flops:.0%}), 节省解码耗时 {(base_busy - busy) * 1000:.0f} ms ({1 - busy / base_busy:.0%})")
+
+
+def run_compile(args):
+    """固定窗口形状下 eager 与 torch.compile（CUDA 上再加 CUDA graph）的单次解码耗时"""
+    model = load_snac(args)
+    modes = [None, "torch_compile"]
+    if torch.device(args.device).type == "cuda":
+        modes.append("cuda_graph")
+    for batch in args.batch or [1]:
+        codes = random_codes(batch, args.frames, args.device)
+        eager = None
+        for mode in modes:
+            decode = make_decode(model, args.device, mode)
+            # 与 SNACDecoder.warmup 相同：编译 / 捕获发生在预热里，不计入解码耗时
+            started = time.perf_counter()
+            decode.warmup(batch, args.frames, args.device)
+            warmup = time.perf_counter() - started
+            seconds = time_call(lambda: decode(codes), args.device, args.repeat)
+            eager = eager or seconds
+            print(f"batch {batch} x {args.frames} 帧 {mode or 'eager'}: 预热 {warmup:.1f} s, "
+                  f"单次解码 {seconds * 1000:.2f} ms, 相对 eager {eager / seconds:.2f}x")
+
+
+# ---- 7 槽帧布局的旧实现（改用 orpheus_tts.codec 之前），仅用于对比 ----
+
+def legacy_convert_to_audio_codes(frame, device):
+    """旧 convert_to_audio：每个码一个单元素 tensor，逐个 torch.cat"""
+    codes_0 = torch.tensor([], device=device, dtype=torch.int32)
+    codes_1 = torch.tensor([], device=device, dtype=torch.int32)
+    codes_2 = torch.tensor([], device=device, dtype=torch.int32)
+    for j in range(len(frame) // 7):
+        i = 7 * j
+        codes_0 = torch.cat([codes_0, torch.tensor([frame[i]], device=device, dtype=torch.int32)])
+        for k in (1, 4):
+            codes_1 = torch.cat([codes_1, torch.tensor([frame[i + k]], device=device, dtype=torch.int32)])
+        for k in (2, 3, 5, 6):
+            codes_2 = torch.cat([codes_2, torch.tensor([frame[i + k]], device=device, dtype=torch.int32)])
+    codes = [codes_0.unsqueeze(0), codes_1.unsqueeze(0), codes_2.unsqueeze(0)]
+    if any(torch.any(c < 0) or torch.any(c > 4096) for c in codes):
+        return None
+    return codes
+
+
+def legacy_tokenize_audio(codes):
+    """旧 clone_orpheus.tokenize_audio：逐个 .item()"""
+    all_codes = []
+    for i in range(codes[0].shape[1]):
+        all_codes.append(codes[0][0][i].item() + 128266)
+        all_codes.append(codes[1][0][2 * i].item() + 128266 + 4096)
+        all_codes.append(codes[2][0][4 * i].item() + 128266 + (2 * 4096))
+        all_codes.append(codes[2][0][(4 * i) + 1].item() + 128266 + (3 * 4096))
+        all_codes.append(codes[1][0][(2 * i) + 1].item() + 128266 + (4 * 4096))
+        all_codes.append(codes[2][0][(4 * i) + 2].item() + 128266 + (5 * 4096))
+        all_codes.append(codes[2][0][(4 * i) + 3].item() + 128266 + (6 * 4096))
+    return all_codes
+
+
+def legacy_redistribute_codes(code_list):
+    """旧 clone_orpheus.redistribute_codes：Python 列表逐个追加"""
+    layer_1, layer_2, layer_3 = [], [], []
+    for i in range((len(code_list) + 1) // 7):
+        layer_1.append(code_list[7 * i])
+        layer_2.append(code_list[7 * i + 1] - 4096)
+        layer_3.append(code_list[7 * i + 2] - (2 * 4096))
+        layer_3.append(code_list[7 * i + 3] - (3 * 4096))
+        layer_2.append(code_list[7 * i + 4] - (4 * 4096))
+        layer_3.append(code_list[7 * i + 5] - (5 * 4096))
+        layer_3.append(code_list[7 * i + 6] - (6 * 4096))
+    return [torch.tensor(layer).unsqueeze(0) for layer in (layer_1, layer_2, layer_3)]
+
+
+def run_codec(args):
+    """每个帧批次的打包 / 拆包耗时：旧的逐码实现与 orpheus_tts.codec 对比，不加载 SNAC"""
+    for num_frames in args.frames or [4, 16, 64, 256]:
+        codes = [c.cpu() for c in random_codes(1, num_frames, args.device)]
+        frame = interleave(codes)[0].tolist()
+        # convert_tokens_to_speech 传入的是生成结果中的一行 tensor
+        row = codes_to_token_ids(interleave(codes))[0]
+        cases = [
+            ("decode 拆包", lambda: legacy_convert_to_audio_codes(frame, args.device),
+             lambda: deinterleave(torch.tensor(frame, device=args.device, dtype=torch.int32))),
+            ("克隆编码打包", lambda: legacy_tokenize_audio(codes),
+             lambda: codes_to_token_ids(interleave(codes))[0].tolist()),
+            ("redistribute", lambda: legacy_redistribute_codes([t - 128266 for t in row]),
+             lambda: deinterleave(remove_slot_offsets(row - 128266))),
+        ]
+        for name, legacy, vectorized in cases:
+            before = time_call(legacy, args.device, args.repeat)
+            after = time_call(vectorized, args.device, args.repeat)
+            print(f"{num_frames:>4} 帧 {name}: 旧实现 {before * 1e6:.0f} us, codec {after * 1e6:.0f} us, "
+                  f"加速 {before / after:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SNAC 解码基准")
+    parser.add_argument("--model", default="hubertsiuzdak/snac_24khz", help="hub id 或本地目录，如 model/snac_24khz")
+    parser.add_argument("--random-init", action="store_true", help="不加载权重，使用随机初始化的 snac_24khz")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--repeat", type=int, default=20)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    window = commands.add_parser("window", help="流式窗口（left,hop,right）的解码量对比，第一个窗口作为基线")
+    window.add_argument("--window", action="append", help="left_context,hop_frames,right_context，可重复；默认 1,1,2 和 1,4,2")
+    window.set_defaults(run=run_window)
+
+    compile_ = commands.add_parser("compile", help="eager 与 torch.compile / CUDA graph 解码对比")
+    compile_.add_argument("--frames", type=int, default=StreamWindow().window_frames, help="窗口帧数，默认流式窗口的 4 帧")
+    compile_.add_argument("--batch", type=int, action="append", help="批大小，可重复；默认 1")
+    compile_.set_defaults(run=run_compile)
+
+    codec = commands.add_parser("codec", help="7 槽帧打包 / 拆包：旧的逐码实现与 orpheus_tts.codec 对比")
+    codec.add_argument("--frames", type=int, action="append", help="每批帧数，可重复；默认 4、16、64、256")
+    codec.set_defaults(run=run_codec)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import os
 from snac import SNAC
+from orpheus_tts.codec import AUDIO_TOKEN_OFFSET, codes_to_token_ids, deinterleave, interleave, remove_slot_offsets
 
 import torch
 from transformers import AutoModelForCausalLM, Trainer, TrainingArguments, AutoTokenizer
@@ -33,15 +34,8 @@ def tokenize_audio(audio_file_path, snac_model):
     with torch.inference_mode():
         codes = snac_model.encode(waveform)
 
-    all_codes = []
-    for i in range(codes[0].shape[1]):
-        all_codes.append(codes[0][0][i].item() + 128266)
-        all_codes.append(codes[1][0][2 * i].item() + 128266 + 4096)
-        all_codes.append(codes[2][0][4 * i].item() + 128266 + (2 * 4096))
-        all_codes.append(codes[2][0][(4 * i) + 1].item() + 128266 + (3 * 4096))
-        all_codes.append(codes[1][0][(2 * i) + 1].item() + 128266 + (4 * 4096))
-        all_codes.append(codes[2][0][(4 * i) + 2].item() + 128266 + (5 * 4096))
-        all_codes.append(codes[2][0][(4 * i) + 3].item() + 128266 + (6 * 4096))
+    frames = interleave([c.cpu() for c in codes])
+    all_codes = codes_to_token_ids(frames)[0].tolist()
 
     return all_codes
 
@@ -135,8 +129,7 @@ def convert_tokens_to_speech(generated_ids, snac_model):
         # row is a 1D tensor with its own length
         row_length = row.size(0)
         new_length = (row_length // 7) * 7  # largest multiple of 7 that fits in this row
-        trimmed_row = row[:new_length]
-        trimmed_row = [t - 128266 for t in trimmed_row]
+        trimmed_row = row[:new_length] - AUDIO_TOKEN_OFFSET
         code_lists.append(trimmed_row)
 
     my_samples = []
@@ -148,24 +141,7 @@ def convert_tokens_to_speech(generated_ids, snac_model):
 
 
 def redistribute_codes(code_list, snac_model):
-    layer_1 = []
-    layer_2 = []
-    layer_3 = []
-
-    for i in range((len(code_list) + 1) // 7):
-        layer_1.append(code_list[7 * i])
-        layer_2.append(code_list[7 * i + 1] - 4096)
-        layer_3.append(code_list[7 * i + 2] - (2 * 4096))
-        layer_3.append(code_list[7 * i + 3] - (3 * 4096))
-        layer_2.append(code_list[7 * i + 4] - (4 * 4096))
-        layer_3.append(code_list[7 * i + 5] - (5 * 4096))
-        layer_3.append(code_list[7 * i + 6] - (6 * 4096))
-
-    codes = [
-        torch.tensor(layer_1).unsqueeze(0),
-        torch.tensor(layer_2).unsqueeze(0),
-        torch.tensor(layer_3).unsqueeze(0)
-    ]
+    codes = deinterleave(remove_slot_offsets(code_list).cpu())
     audio_hat = snac_model.decode(codes)
     return audio_hat
 
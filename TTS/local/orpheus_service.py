@@ -0,0 +1,199 @@
+"""server_orpheus.py（Flask）和 server_orpheus_async.py（ASGI）共用的引擎、缓存、准入和 WAV 工具"""
+import json
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+
+from orpheus_tts import ModelManager, SNACDecoder
+from orpheus_tts.metrics import REGISTRY as metrics
+from audio_cache import AudioCache
+from admission import AdmissionController
+from archive import ArchiveWriter
+
+
+def generate_wav_filename(name):
+    now = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    return f"{name}_{now}.wav"
+
+
+# SNAC 解码交给批处理线程：并发流的窗口合并成一次解码，异步服务的事件循环也不会被 GPU 解码阻塞
+snac_decoder = SNACDecoder(batching=True)
+
+lora_dir = os.environ.get("ORPHEUS_LORA_DIR")
+if lora_dir:
+    # 单个基座模型 + 多个 LoRA 适配器（finetune/lora.py 输出目录），按语言/音色选择，
+    # 所有音色共享一个连续批处理，每增加一个音色只多占几十 MB 显存
+    model_specs = {
+        "orpheus-zh-pretrain": dict(
+            model_name="model/orpheus-zh-pretrain",
+            decoder=snac_decoder,
+            lora_dir=lora_dir,
+            lora_routes={"en": "orpheus-zh-ft"},
+        ),
+    }
+    lang_models = {"en": "orpheus-zh-pretrain", "zh": "orpheus-zh-pretrain"}
+else:
+    model_specs = {
+        "orpheus-zh-ft": dict(model_name="model/orpheus-zh-ft", decoder=snac_decoder),
+        "orpheus-zh-pretrain": dict(model_name="model/orpheus-zh-pretrain", decoder=snac_decoder),
+    }
+    lang_models = {"en": "orpheus-zh-ft", "zh": "orpheus-zh-pretrain"}
+
+sample_rate_en=24000
+sample_rate_zh=32000
+
+# 预热话术：模型加载后、对外服务前按音色各合成一遍，避免首批请求承担 CUDA/内核预热。
+# 可用 ORPHEUS_WARMUP 指向同格式的 JSON 文件覆盖
+DEFAULT_WARMUP = {
+    "zh": {"voices": ["白芷"], "prompts": ["您好，这里是售后服务中心。", "请先确认电脑已经连接电源适配器。"]},
+    "en": {"voices": ["zoe"], "prompts": ["Hello, thanks for calling. How can I help you today?"]},
+}
+
+
+def load_warmup_config():
+    path = os.environ.get("ORPHEUS_WARMUP")
+    if not path:
+        return DEFAULT_WARMUP
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+warmup_config = load_warmup_config()
+
+
+def warm_up_model(name, model):
+    """ModelManager 的 on_load 回调：用该模型负责的各语言话术预热"""
+    for lang, model_key in lang_models.items():
+        if model_key == name and lang in warmup_config:
+            config = warmup_config[lang]
+            model.warmup(config["prompts"], config.get("voices") or [None], lang=lang, **sampling_params)
+
+# 固定话术（问候、等待提示、排障步骤）反复出现，命中缓存时直接回放 PCM
+audio_cache = AudioCache("./cache/orpheus")
+
+# 准入控制：限制同时合成的请求数，排队超过 max_wait 秒直接拒绝（带 Retry-After），
+# 避免突发流量下所有请求一起变慢、全部超过 3 秒的端到端目标
+admission = AdmissionController(
+    max_active=int(os.environ.get("ORPHEUS_MAX_ACTIVE", 8)),
+    max_queue=int(os.environ.get("ORPHEUS_MAX_QUEUE", 32)),
+    max_wait=float(os.environ.get("ORPHEUS_MAX_WAIT", 1.0)),
+)
+
+# 合成结果归档到 ./output：后台线程写盘，积压超过上限时按策略丢弃（drop，默认）或阻塞（block）
+archive_writer = ArchiveWriter(
+    max_pending_bytes=int(os.environ.get("ORPHEUS_ARCHIVE_MAX_PENDING", 64 * 1024 * 1024)),
+    policy=os.environ.get("ORPHEUS_ARCHIVE_POLICY", "drop"),
+)
+
+# max_tokens 不再固定为 2000，由 OrpheusModel 的 GenerationBudget 按文本长度和语言设置
+sampling_params = dict(
+    repetition_penalty=1.1,
+    stop_token_ids=[128258],
+    temperature=0.4,
+    top_p=0.9
+)
+
+# 模型首次使用时才加载（加载后先预热）；常驻数超过 ORPHEUS_MAX_RESIDENT 时换出最久未用的空闲模型，
+# ORPHEUS_MODEL_SLEEP=1 时换出改为 vLLM 休眠（权重卸载到内存，唤醒比重新加载快）
+models = ModelManager(
+    model_specs,
+    max_resident=int(os.environ.get("ORPHEUS_MAX_RESIDENT", 2)),
+    sleep=os.environ.get("ORPHEUS_MODEL_SLEEP") == "1",
+    on_load=warm_up_model,
+)
+
+# 启动：后台加载并预热各语言的默认模型（每个模型内部并行初始化引擎、分词器和 SNAC），
+# 完成前 /ready 返回 503，滚动重启时负载均衡不会把请求打到冷实例上
+startup = {"ready": False, "error": None, "phases": {}}
+_startup_began = time.monotonic()
+
+
+def _start_up():
+    try:
+        names = list(dict.fromkeys(lang_models.values()))[:models.max_resident]
+        loads = [(name, models.prefetch(name)) for name in names]
+        for name, load in loads:
+            model = load.result()
+            stats = models.stats()[name]
+            startup["phases"][name] = dict(model.startup_timings, load=stats["load_seconds"], warmup=stats["warmup_seconds"])
+        startup["ready"] = True
+    except Exception as e:
+        startup["error"] = repr(e)
+    startup["phases"]["total"] = time.monotonic() - _startup_began
+    print(f"[启动完成] ready={startup['ready']} 耗时: {startup['phases']}")
+
+
+threading.Thread(target=_start_up, name="orpheus-startup", daemon=True).start()
+
+
+def readiness():
+    return dict(startup, uptime=time.monotonic() - _startup_began)
+
+
+def select_model(lang, voice=None):
+    """按语言返回 (模型名, voice, sample_rate)；voice 为空时使用该语言的默认音色，"默认" 表示不加音色前缀"""
+    if lang == "en":
+        voice, sample_rate = voice or 'zoe', sample_rate_en
+    else:
+        voice, sample_rate = voice or '白芷', sample_rate_zh
+    if voice == "默认":
+        voice = None
+    return lang_models.get(lang, lang_models["zh"]), voice, sample_rate
+
+
+def lease_model(model_key, slot):
+    """取得模型租约（未加载时在此等待加载）；加载失败时归还准入名额"""
+    try:
+        return models.acquire(model_key)
+    except BaseException:
+        slot.release()
+        raise
+
+
+def cancel(request_id):
+    cancelled = [model.cancel(request_id) for model in models.resident()]
+    return any(cancelled)
+
+
+def create_wav_header(sample_rate, bits_per_sample=16, channels=1):
+    byte_rate = sample_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+
+    data_size = 0
+
+    header = struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF',
+        36 + data_size,
+        b'WAVE',
+        b'fmt ',
+        16,
+        1,
+        channels,
+        sample_rate,
+        byte_rate,
+        block_align,
+        bits_per_sample,
+        b'data',
+        data_size
+    )
+    return header
+
+
+def render_metrics():
+    """Prometheus 文本：请求时延直方图 + 缓存、准入、中止、预算、SNAC 批处理统计"""
+    extra = [
+        ("orpheus_audio_cache", {}, audio_cache.stats()),
+        ("orpheus_admission", {}, admission.stats()),
+        ("orpheus_archive", {}, archive_writer.stats()),
+        ("orpheus_snac_batches", {}, snac_decoder.stats()),
+    ]
+    for name, stats in models.stats().items():
+        extra.append(("orpheus_model", {"model": name}, stats))
+    for engine in models.resident():
+        labels = {"model": engine.model_name}
+        extra.append(("orpheus_aborts", labels, engine.abort_stats))
+        extra.append(("orpheus_budget_stops", labels, dict(engine.budget.stops)))
+    return metrics.render(extra)
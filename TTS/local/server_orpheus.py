@@ -1,45 +1,41 @@
 from flask import Flask, Response, request, render_template
-import struct
-from orpheus_tts import OrpheusModel
+from flask_sock import Sock
+import json
+import threading
+import uuid
+from orpheus_tts import TextFeed
+from orpheus_tts.metrics import REGISTRY as metrics
+from orpheus_tts.scheduling import PRIORITY_CLASSES
 import os
-from datetime import datetime
-
-def generate_wav_filename(name):
-    now = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    return f"{name}_{now}.wav"
+from audio_cache import AudioCache
+from admission import Rejected
+from orpheus_service import (
+    admission,
+    archive_writer,
+    audio_cache,
+    cancel,
+    create_wav_header,
+    generate_wav_filename,
+    render_metrics,
+    sampling_params,
+    lease_model,
+    models,
+    readiness,
+    select_model,
+)
 
 
 app = Flask(__name__)
+sock = Sock(app)
+
 
-engine_en = OrpheusModel(model_name="model/orpheus-zh-ft")
-sample_rate_en=24000
-
-engine_zh = OrpheusModel(model_name="model/orpheus-zh-pretrain")
-sample_rate_zh=32000
-
-def create_wav_header(sample_rate, bits_per_sample=16, channels=1):
-    byte_rate = sample_rate * channels * bits_per_sample // 8
-    block_align = channels * bits_per_sample // 8
-
-    data_size = 0
-
-    header = struct.pack(
-        '<4sI4s4sIHHIIHH4sI',
-        b'RIFF',
-        36 + data_size,       
-        b'WAVE',
-        b'fmt ',
-        16,                  
-        1,             
-        channels,
-        sample_rate,
-        byte_rate,
-        block_align,
-        bits_per_sample,
-        b'data',
-        data_size
+def reject(exc):
+    return Response(
+        json.dumps({"error": exc.reason, "retry_after": exc.retry_after}),
+        status=exc.status,
+        mimetype='application/json',
+        headers={"Retry-After": str(exc.retry_after)},
     )
-    return header
 
 
 @app.route('/tts', methods=['GET'])
@@ -47,75 +43,169 @@ def tts():
     prompt = request.args.get('prompt', '')
     
     lang_param = request.args.get('lang', 'zh')
-    
-    if lang_param == "en":
-        voice = request.args.get('voice', 'zoe')
-        if voice == "默认":
-            voice = None
-        sample_rate = sample_rate_en
-    else:
-        voice = request.args.get('voice', '白芷')
-        if voice == "默认":
-            voice = None
-        sample_rate = sample_rate_zh
-
-    name = prompt + '_' + voice
+    model_key, voice, sample_rate = select_model(lang_param, request.args.get('voice'))
+
+    name = f"{prompt}_{voice}"
     filename = generate_wav_filename(name)
     filepath = os.path.join("./output", filename)
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
 
+    request_id = f"tts-{uuid.uuid4().hex}"
+    # 调度优先级：interactive（默认，对话场景）/ normal / batch；session 用于同一会话内的公平分配
+    priority = request.args.get('priority', 'interactive')
+    if priority not in PRIORITY_CLASSES:
+        return Response(f"unknown priority: {priority}", status=400)
+    session_id = request.args.get('session') or None
+    cache_key = AudioCache.make_key(prompt, voice, lang_param, sampling_params, models.model_name(model_key))
+
+    def generate_cached_stream(pcm):
+        yield create_wav_header(sample_rate)
+        yield from audio_cache.chunks(pcm)
+
+    cached = audio_cache.get(cache_key)
+    if cached is not None:
+        return Response(generate_cached_stream(cached), mimetype='audio/wav')
+
+    # 缓存命中不占用引擎，只有真正合成的请求才排队
+    try:
+        slot = admission.acquire()
+    except Rejected as exc:
+        return reject(exc)
+    metrics.queue_wait.observe(slot.wait)
+    lease = lease_model(model_key, slot)
+    engine = lease.model
 
     def generate_audio_stream():
-        with open(filepath, "wb") as f:
-            # 写入WAV头（先写一个假的 data_size 为0，后面再回填）
-            f.write(create_wav_header(sample_rate))
-
-            total_audio_data = b''
-
-            yield create_wav_header(sample_rate)
-
-            if lang_param == "en":
-                syn_tokens = engine_en.generate_speech(
-                    prompt=prompt,
-                    voice=voice,
-                    repetition_penalty=1.1,
-                    stop_token_ids=[128258],
-                    max_tokens=2000,
-                    temperature=0.4,
-                    top_p=0.9
-                )
-                for chunk in syn_tokens:
-                    yield chunk
-                    total_audio_data += chunk
-                    f.write(chunk)
-                
-            elif lang_param == "zh":
-                syn_tokens = engine_zh.generate_speech(
-                    prompt=prompt,
-                    voice=voice,
-                    repetition_penalty=1.1,
-                    stop_token_ids=[128258],
-                    max_tokens=2000,
-                    temperature=0.4,
-                    top_p=0.9
-                )
-                for chunk in syn_tokens:
-                    yield chunk
-                    total_audio_data += chunk
-                    f.write(chunk)
-
-            # 回填 WAV 文件大小（RIFF chunk size 和 data chunk size）
-            data_size = len(total_audio_data)
-            riff_size = 36 + data_size
-            with open(filepath, "r+b") as fw:
-                fw.seek(4)
-                fw.write(struct.pack('<I', riff_size))
-                fw.seek(40)
-                fw.write(struct.pack('<I', data_size))
-
-            print(f"[保存成功] 音频文件保存在: {filepath}")
-
-    return Response(generate_audio_stream(), mimetype='audio/wav')
+        # 归档文件由后台线程写入，这里只移交块的引用，磁盘慢也不会拖慢返回给客户端的音频
+        archive = archive_writer.open(filepath, create_wav_header(sample_rate))
+        chunks = []
+        # 被 /tts/cancel 打断或被生成预算提前截停的分句，音频不完整
+        stops = []
+
+        yield create_wav_header(sample_rate)
+
+        # 长文本按句切分，所有分句同时提交给引擎，按顺序流式返回
+        syn_tokens = engine.generate_speech_segments(
+            prompt=prompt,
+            voice=voice,
+            lang=lang_param,
+            request_id=request_id,
+            priority=priority,
+            session_id=session_id,
+            on_stop=lambda request_id, reason: stops.append(reason),
+            **sampling_params
+        )
+        try:
+            for chunk in syn_tokens:
+                yield chunk
+                chunks.append(chunk)
+                archive.write(chunk)
+        finally:
+            # 客户端断开或打断时，生成器被关闭，中止引擎中未完成的请求
+            syn_tokens.close()
+            archive.close()
+
+        # 完整合成后才写入缓存（只在结束时拼接一次），截断的音频不缓存
+        if not stops:
+            audio_cache.put(cache_key, b"".join(chunks))
+
+    response = Response(generate_audio_stream(), mimetype='audio/wav', headers={
+        "X-Request-Id": request_id,
+        "X-Queue-Wait-Ms": str(int(slot.wait * 1000)),
+    })
+    # 响应关闭（完成、客户端断开或生成器未启动）时归还名额
+    response.call_on_close(slot.release)
+    response.call_on_close(lease.release)
+    return response
+
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """就绪探针：模型加载和预热完成前返回 503，并给出各启动阶段耗时"""
+    state = readiness()
+    return Response(json.dumps(state, ensure_ascii=False), status=200 if state["ready"] else 503, mimetype='application/json')
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus 抓取接口"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/tts/admission', methods=['GET'])
+def tts_admission():
+    """队列深度、等待时间等准入统计，供自动扩缩容使用"""
+    return admission.stats()
+
+
+@app.route('/tts/cancel', methods=['GET', 'POST'])
+def tts_cancel():
+    """打断（barge-in）：按 /tts 响应头中的 X-Request-Id 中止合成"""
+    request_id = request.args.get('request_id', '')
+    cancelled = cancel(request_id)
+    return {"request_id": request_id, "cancelled": cancelled}
+
+
+@sock.route('/tts/stream')
+def tts_stream(ws):
+    """双向流式 TTS：客户端边生成边发送文本，服务端边合成边回传 PCM。
+
+    客户端消息（JSON 文本帧）：
+        {"type": "text", "text": "..."}  追加文本增量
+        {"type": "flush"}                立即合成已缓存但未成句的文本
+        {"type": "cancel"}               打断：中止当前已提交的合成
+        {"type": "close"}                文本结束，合成完剩余内容后关闭
+    服务端先发送 {"type": "start", "sample_rate": ...}，之后以二进制帧发送
+    16bit 单声道 PCM，全部完成后发送 {"type": "done"}。
+    """
+    lang_param = request.args.get('lang', 'zh')
+    model_key, voice, sample_rate = select_model(lang_param, request.args.get('voice'))
+
+    try:
+        slot = admission.acquire()
+    except Rejected as exc:
+        ws.send(json.dumps({"type": "error", "status": exc.status, "error": exc.reason, "retry_after": exc.retry_after}))
+        return
+    metrics.queue_wait.observe(slot.wait)
+    lease = lease_model(model_key, slot)
+    engine = lease.model
+
+    feed = TextFeed()
+    stream_id = f"ws-{uuid.uuid4().hex}"
+    session_id = request.args.get('session') or stream_id
+    ws.send(json.dumps({"type": "start", "sample_rate": sample_rate}))
+
+    def send_audio():
+        audio = engine.generate_speech_stream(text_stream=feed, voice=voice, lang=lang_param, request_id=stream_id, priority="interactive", session_id=session_id, **sampling_params)
+        try:
+            for chunk in audio:
+                ws.send(chunk)
+        finally:
+            audio.close()
+
+    sender = threading.Thread(target=send_audio)
+    sender.start()
+    closed = False
+    try:
+        while True:
+            message = json.loads(ws.receive())
+            if message.get("type") == "text":
+                feed.put(message.get("text", ""))
+            elif message.get("type") == "flush":
+                feed.flush()
+            elif message.get("type") == "cancel":
+                engine.cancel(stream_id)
+            elif message.get("type") == "close":
+                closed = True
+                break
+    finally:
+        if not closed:
+            # 客户端断开：中止所有未完成的合成
+            engine.cancel(stream_id)
+        feed.close()
+        sender.join()
+        slot.release()
+        lease.release()
+    ws.send(json.dumps({"type": "done"}))
 
 
 if __name__ == '__main__':
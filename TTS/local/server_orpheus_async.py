@@ -0,0 +1,224 @@
+"""Orpheus TTS 的 ASGI 版本：接口与 server_orpheus.py 相同，但所有请求共用一个事件循环。
+
+Flask 版本每个 /tts 请求占一个 WSGI 线程，外加 orpheus_tts 同步接口内部的两个桥接线程；
+这里直接使用 generate_speech_segments_async / generate_speech_stream_async，
+token 从引擎循环转发到服务循环，SNAC 解码交给批处理线程，请求本身不再占用线程。
+
+启动：uvicorn server_orpheus_async:app --host 0.0.0.0 --port 8090
+"""
+import asyncio
+import json
+import os
+import uuid
+from typing import Optional
+
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from orpheus_tts import TextFeed
+from orpheus_tts.metrics import REGISTRY as metrics
+from orpheus_tts.scheduling import PRIORITY_CLASSES
+from audio_cache import AudioCache
+from admission import Rejected
+from orpheus_service import (
+    admission,
+    archive_writer,
+    audio_cache,
+    cancel,
+    create_wav_header,
+    generate_wav_filename,
+    render_metrics,
+    sampling_params,
+    lease_model,
+    models,
+    readiness,
+    select_model,
+)
+
+app = FastAPI(title="Orpheus TTS", version="1.0.0")
+
+
+async def acquire_slot():
+    """准入：有空位时直接通过，需要排队时才借用线程池等待（最多 max_queue 个）"""
+    return admission.try_acquire() or await asyncio.to_thread(admission.acquire)
+
+
+async def acquire_lease(model_key, slot):
+    """模型已常驻时直接取得租约，否则在线程池中等待加载"""
+    return models.try_acquire(model_key) or await asyncio.to_thread(lease_model, model_key, slot)
+
+
+def release_all(*handles):
+    for handle in handles:
+        handle.release()
+
+
+def reject(exc):
+    return Response(
+        json.dumps({"error": exc.reason, "retry_after": exc.retry_after}),
+        status_code=exc.status,
+        media_type='application/json',
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.get('/tts')
+async def tts(prompt: str = '', lang: str = 'zh', voice: Optional[str] = None,
+              priority: str = 'interactive', session: Optional[str] = None):
+    model_key, voice, sample_rate = select_model(lang, voice)
+    if priority not in PRIORITY_CLASSES:
+        return Response(f"unknown priority: {priority}", status_code=400)
+
+    filepath = os.path.join("./output", generate_wav_filename(f"{prompt}_{voice}"))
+
+    request_id = f"tts-{uuid.uuid4().hex}"
+    cache_key = AudioCache.make_key(prompt, voice, lang, sampling_params, models.model_name(model_key))
+
+    # 磁盘层命中会读文件并更新 mtime，放到线程池里做
+    cached = await asyncio.to_thread(audio_cache.get, cache_key)
+    if cached is not None:
+        async def generate_cached_stream():
+            yield create_wav_header(sample_rate)
+            for chunk in audio_cache.chunks(cached):
+                yield chunk
+        return StreamingResponse(generate_cached_stream(), media_type='audio/wav')
+
+    # 缓存命中不占用引擎，只有真正合成的请求才排队
+    try:
+        slot = await acquire_slot()
+    except Rejected as exc:
+        return reject(exc)
+    metrics.queue_wait.observe(slot.wait)
+    lease = await acquire_lease(model_key, slot)
+    engine = lease.model
+
+    async def generate_audio_stream():
+        # 归档交给后台线程，事件循环里不做磁盘 I/O
+        archive = archive_writer.open(filepath, create_wav_header(sample_rate))
+        chunks = []
+        # 被 /tts/cancel 打断或被生成预算提前截停的分句，音频不完整
+        stops = []
+        try:
+            yield create_wav_header(sample_rate)
+
+            # 长文本按句切分，所有分句同时提交给引擎，按顺序流式返回；
+            # 客户端断开时生成器被取消，未完成的分句随之中止
+            async for chunk in engine.generate_speech_segments_async(
+                prompt=prompt,
+                voice=voice,
+                lang=lang,
+                request_id=request_id,
+                priority=priority,
+                session_id=session,
+                on_stop=lambda request_id, reason: stops.append(reason),
+                **sampling_params
+            ):
+                yield chunk
+                chunks.append(chunk)
+                if archive_writer.policy == "block":
+                    # block 策略下写入可能等待磁盘，放到线程池里等，事件循环上的其他流不受影响
+                    await asyncio.to_thread(archive.write, chunk)
+                else:
+                    archive.write(chunk)
+        finally:
+            archive.close()
+            slot.release()
+            lease.release()
+
+        # 完整合成后才写入缓存（只在结束时拼接一次），截断的音频不缓存
+        if not stops:
+            await asyncio.to_thread(audio_cache.put, cache_key, b"".join(chunks))
+
+    # 生成器未启动就断开时，由 background 归还名额（release 可重复调用）
+    return StreamingResponse(generate_audio_stream(), media_type='audio/wav', headers={
+        "X-Request-Id": request_id,
+        "X-Queue-Wait-Ms": str(int(slot.wait * 1000)),
+    }, background=BackgroundTask(release_all, slot, lease))
+
+
+@app.get('/ready')
+async def ready():
+    """就绪探针：模型加载和预热完成前返回 503，并给出各启动阶段耗时"""
+    state = readiness()
+    return Response(json.dumps(state, ensure_ascii=False), status_code=200 if state["ready"] else 503, media_type='application/json')
+
+
+@app.get('/metrics')
+async def prometheus_metrics():
+    """Prometheus 抓取接口"""
+    return Response(render_metrics(), media_type='text/plain; version=0.0.4')
+
+
+@app.get('/tts/admission')
+async def tts_admission():
+    """队列深度、等待时间等准入统计，供自动扩缩容使用"""
+    return admission.stats()
+
+
+@app.api_route('/tts/cancel', methods=['GET', 'POST'])
+async def tts_cancel(request_id: str = ''):
+    """打断（barge-in）：按 /tts 响应头中的 X-Request-Id 中止合成"""
+    return {"request_id": request_id, "cancelled": cancel(request_id)}
+
+
+@app.websocket('/tts/stream')
+async def tts_stream(ws: WebSocket, lang: str = 'zh', voice: Optional[str] = None, session: Optional[str] = None):
+    """双向流式 TTS，消息格式与 server_orpheus.py 的 /tts/stream 相同。"""
+    model_key, voice, sample_rate = select_model(lang, voice)
+    await ws.accept()
+
+    try:
+        slot = await acquire_slot()
+    except Rejected as exc:
+        await ws.send_text(json.dumps({"type": "error", "status": exc.status, "error": exc.reason, "retry_after": exc.retry_after}))
+        await ws.close()
+        return
+    metrics.queue_wait.observe(slot.wait)
+    lease = await acquire_lease(model_key, slot)
+    engine = lease.model
+
+    feed = TextFeed()
+    stream_id = f"ws-{uuid.uuid4().hex}"
+    session_id = session or stream_id
+    await ws.send_text(json.dumps({"type": "start", "sample_rate": sample_rate}))
+
+    async def send_audio():
+        async for chunk in engine.generate_speech_stream_async(text_stream=feed, voice=voice, lang=lang, request_id=stream_id, priority="interactive", session_id=session_id, **sampling_params):
+            await ws.send_bytes(chunk)
+
+    sender = asyncio.ensure_future(send_audio())
+    closed = False
+    try:
+        while True:
+            message = json.loads(await ws.receive_text())
+            if message.get("type") == "text":
+                feed.put(message.get("text", ""))
+            elif message.get("type") == "flush":
+                feed.flush()
+            elif message.get("type") == "cancel":
+                engine.cancel(stream_id)
+            elif message.get("type") == "close":
+                closed = True
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        feed.close()
+        if not closed:
+            # 客户端断开：取消发送任务，中止所有未完成的合成
+            sender.cancel()
+        try:
+            await sender
+        except asyncio.CancelledError:
+            pass
+        finally:
+            slot.release()
+            lease.release()
+    if closed:
+        await ws.send_text(json.dumps({"type": "done"}))
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=8090)